@@ -19,4 +19,7 @@ class Controller:
             self.home.show()
         else:
             self.auth.show()
-        self.view.start()
+        try:
+            self.view.start()
+        finally:
+            self.model.close()
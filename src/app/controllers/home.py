@@ -614,10 +614,13 @@ class HomeController:
             summary = MeasureSummary(dir_path=dir_path,
                                      file_name=file_name,
                                      connection=self.model.connection)
-            for measure_id in self.model.home.selected_versions:
-                self.page.update_prompt(f'Retrieving measure {measure_id}...')
-                measure = self.model.connection.get_measure(measure_id)
-                summary.add_measure(measure)
+            self.page.update_prompt('Retrieving measures...')
+            measures = self.model.connection.get_measures(
+                self.model.home.selected_versions)
+            for measure in measures:
+                if isinstance(measure, Exception):
+                    raise measure
+            summary.add_measures(measures)
         except Exception as err:
             error = err
 
@@ -1,14 +1,36 @@
-from src.etrm import ETRMConnection
+import os
+import sys
+
+from src import _ROOT
+from src.etrm import ETRMConnection, ETRMCache, DiskCache
 from src.app.models.auth import AuthModel
 from src.app.models.home import HomeModel
 
 
+if getattr(sys, 'frozen', False):
+    CACHE_DIR = os.path.normpath(os.path.join(_ROOT, '..', '..', 'cache'))
+else:
+    CACHE_DIR = os.path.normpath(os.path.join(_ROOT, '..', 'cache'))
+
+
 class Model:
     def __init__(self):
         self.connection: ETRMConnection | None = None
+        self.cache = ETRMCache(DiskCache(os.path.join(CACHE_DIR, 'etrm.db')))
         self.auth = AuthModel()
         self.home = HomeModel()
 
     def connect(self, auth_token: str):
-        self.connection = ETRMConnection(auth_token)
+        self.disconnect()
+        self.connection = ETRMConnection(auth_token, cache=self.cache)
         self.auth.set_token(auth_token)
+
+    def disconnect(self):
+        if self.connection != None:
+            self.connection.close()
+            self.connection = None
+
+    def close(self):
+        self.disconnect()
+        if self.cache.disk != None:
+            self.cache.disk.close()
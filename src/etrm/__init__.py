@@ -1,2 +1,4 @@
+from .cache import ETRMCache, DiskCache
 from .connection import ETRMConnection, API_URL
+from .async_connection import AsyncETRMConnection
 from .models import ETRM_URL
@@ -0,0 +1,409 @@
+from __future__ import annotations
+import asyncio
+import aiohttp
+from typing import Mapping
+
+from src.etrm import decoding
+from src.etrm.cache import ETRMCache, Validators
+from src.etrm.connection import API_URL, extract_id
+from src.etrm.models import (
+    MeasuresResponse,
+    MeasureVersionsResponse,
+    Measure,
+    Reference
+)
+from src.lookups import USE_CATEGORIES
+from src.exceptions import status_error
+
+
+class AsyncETRMConnection:
+    """Asyncio eTRM API connection layer.
+
+    Provides the same API as `ETRMConnection` as coroutines. Connections
+    can share an `ETRMCache` (including with an `ETRMConnection`) through
+    `cache`. Cache access and measure decoding run in worker threads, so
+    they do not block the event loop.
+
+    The connection must be closed with `close()` or used as an async
+    context manager.
+
+    Concurrency configuration:
+        `max_concurrency` - max number of requests in flight at once
+
+        `max_host_connections` - max connections kept alive per host
+
+        `timeout` - total timeout (in seconds) of each request
+    """
+
+    def __init__(self,
+                 auth_token: str,
+                 cache: ETRMCache | None=None,
+                 max_concurrency: int=32,
+                 max_host_connections: int=32,
+                 timeout: float=60):
+        self.auth_token = auth_token
+        self.cache = cache or ETRMCache()
+        self.max_host_connections = max_host_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.__session: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self) -> AsyncETRMConnection:
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self.__session is None or self.__session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.max_host_connections)
+            self.__session = aiohttp.ClientSession(
+                headers={'Authorization': self.auth_token},
+                connector=connector,
+                timeout=self.timeout)
+        return self.__session
+
+    async def close(self):
+        """Closes all pooled connections."""
+
+        if self.__session != None:
+            await self.__session.close()
+            self.__session = None
+
+    async def __get(self,
+                    url: str,
+                    not_found: str,
+                    server_error: str,
+                    params: dict[str, str] | None=None,
+                    headers: dict[str, str] | None=None
+                   ) -> tuple[int, bytes | None, Mapping[str, str]]:
+        """Returns the status code, body and headers of the response.
+
+        The body of a 304 response is `None`.
+        """
+
+        async with self.semaphore:
+            try:
+                async with self.session.get(url,
+                                            params=params,
+                                            headers=headers) as response:
+                    error = status_error(response.status,
+                                         not_found=not_found,
+                                         server_error=server_error,
+                                         unauthorized=('Unauthorized token:'
+                                                       f' {self.auth_token}'))
+                    if error != None:
+                        raise error
+
+                    body = None
+                    if response.status != 304:
+                        body = await response.read()
+                    return (response.status, body, response.headers)
+            except (aiohttp.ClientConnectionError,
+                    asyncio.TimeoutError) as err:
+                raise ConnectionError from err
+
+    async def get_measure(self, full_version_id: str) -> Measure:
+        """Returns a detailed measure object.
+
+        Errors:
+            `NotFoundError` - (404) measure not found
+
+            `ETRMResponseError` - (500) server error
+
+            `UnauthorizedError` - (!200) any other error
+        """
+
+        cached_measure = await asyncio.to_thread(self.cache.get_measure,
+                                                 full_version_id)
+        if cached_measure != None:
+            return cached_measure
+
+        statewide_id, version_id = full_version_id.split('-', 1)
+        url = f'{API_URL}/measures/{statewide_id}/{version_id}'
+        _, body, _ = await self.__get(
+            url,
+            f'Measure {full_version_id} could not be found',
+            'Server error occurred when retrieving measure'
+                f' {full_version_id}')
+        return await asyncio.to_thread(self.__add_measure, body)
+
+    def __add_measure(self, body: bytes) -> Measure:
+        """Decodes and caches the measure response body `body`."""
+
+        measure = Measure(decoding.loads(body), len(body))
+        self.cache.add_measure(measure)
+        return measure
+
+    async def get_measures(self,
+                           full_version_ids: list[str]
+                          ) -> list[Measure | Exception]:
+        """Returns a list of detailed measure objects in the same order
+        as `full_version_ids`.
+
+        Errors do not abort the batch, any error raised while retrieving
+        a measure is returned in place of that measure.
+        """
+
+        version_ids = list(dict.fromkeys(full_version_ids))
+        results = await asyncio.gather(
+            *[self.get_measure(version_id) for version_id in version_ids],
+            return_exceptions=True)
+        measures = dict(zip(version_ids, results))
+        return [measures[version_id] for version_id in full_version_ids]
+
+    async def get_measure_ids(self,
+                              offset: int=0,
+                              limit: int=25,
+                              use_category: str | None=None
+                             ) -> tuple[list[str], int]:
+        """Returns a list of measure ids.
+
+        Only the parts of the window that are not already cached are
+        retrieved. Expired cached pages are revalidated with a conditional
+        request.
+
+        Errors:
+            `NotFoundError` - (404) measure not found
+
+            `ETRMResponseError` - (500) server error
+
+            `UnauthorizedError` - (!200) any other error
+        """
+
+        cache_response = await asyncio.to_thread(self.cache.get_ids,
+                                                 offset,
+                                                 limit,
+                                                 use_category)
+        if cache_response != None:
+            return cache_response
+
+        missing = await asyncio.to_thread(self.cache.missing_ids,
+                                          offset,
+                                          limit,
+                                          use_category)
+        await asyncio.gather(
+            *[self.__get_id_page(page_offset, page_limit, use_category)
+                for page_offset, page_limit
+                in missing])
+
+        cache_response = await asyncio.to_thread(self.cache.get_ids,
+                                                 offset,
+                                                 limit,
+                                                 use_category)
+        if cache_response != None:
+            return cache_response
+
+        return await self.__get_id_page(offset, limit, use_category)
+
+    async def get_all_measure_ids(self,
+                                  use_category: str | None=None,
+                                  page_size: int=100
+                                 ) -> list[str]:
+        """Returns every measure ID of `use_category` (or of all measures
+        if no use category is provided) in catalog order.
+
+        See `get_catalog()` for details.
+        """
+
+        catalog = await self.get_catalog([use_category], page_size)
+        return catalog[use_category]
+
+    async def get_catalog(self,
+                          use_categories: list[str | None] | None=None,
+                          page_size: int=100
+                         ) -> dict[str | None, list[str]]:
+        """Returns every measure ID of each use category in
+        `use_categories`, in catalog order. The IDs of all measures are
+        mapped to `None`.
+
+        Crawls the measure IDs of all use categories (and all measures)
+        by default.
+
+        The first page of each use category provides its total count,
+        all remaining pages of `page_size` IDs are then retrieved
+        concurrently. All retrieved IDs are added to the ID cache, so
+        later paging is answered locally.
+
+        Errors:
+            `NotFoundError` - (404) measure not found
+
+            `ETRMResponseError` - (500) server error
+
+            `UnauthorizedError` - (!200) any other error
+        """
+
+        if use_categories is None:
+            use_categories = [None, *USE_CATEGORIES.keys()]
+
+        first_pages = await asyncio.gather(
+            *[self.get_measure_ids(0, page_size, use_category)
+                for use_category
+                in use_categories])
+        counts = {use_category: count
+                    for use_category, (_, count)
+                    in zip(use_categories, first_pages)}
+        await asyncio.gather(
+            *[self.get_measure_ids(offset, page_size, use_category)
+                for use_category, count
+                in counts.items()
+                for offset
+                in range(page_size, count, page_size)])
+
+        catalog: dict[str | None, list[str]] = {}
+        for use_category, count in counts.items():
+            measure_ids, _ = await self.get_measure_ids(0, count, use_category)
+            catalog[use_category] = measure_ids
+        return catalog
+
+    async def __get_id_page(self,
+                            offset: int,
+                            limit: int,
+                            use_category: str | None=None
+                           ) -> tuple[list[str], int]:
+        params = {
+            'offset': str(offset),
+            'limit': str(limit)
+        }
+
+        if use_category != None:
+            params['use_category'] = use_category
+
+        stale_page = await asyncio.to_thread(self.cache.get_stale_ids,
+                                             offset,
+                                             limit,
+                                             use_category)
+        headers = None if stale_page is None else stale_page[2].headers
+        status, body, response_headers = await self.__get(
+            f'{API_URL}/measures',
+            'Measures could not be found',
+            'Server error occurred when retrieving measures',
+            params=params,
+            headers=headers)
+        if status == 304 and stale_page != None:
+            measure_ids, count, _ = stale_page
+            await asyncio.to_thread(self.cache.refresh_ids,
+                                    measure_ids=measure_ids,
+                                    offset=offset,
+                                    limit=limit,
+                                    count=count,
+                                    use_category=use_category)
+            return (measure_ids, count)
+
+        response_body = MeasuresResponse(decoding.loads(body))
+        measure_ids = list(map(lambda result: extract_id(result.url),
+                               response_body.results))
+        count = response_body.count
+        await asyncio.to_thread(self.cache.add_ids,
+                                measure_ids=measure_ids,
+                                offset=offset,
+                                limit=limit,
+                                count=count,
+                                use_category=use_category,
+                                validators=Validators.from_headers(
+                                    response_headers))
+        return (measure_ids, count)
+
+    async def get_measure_versions(self, measure_id: str) -> list[str]:
+        """Returns a list of versions of the measure with the ID
+        `measure_id`.
+
+        Expired cached versions are revalidated with a conditional request.
+
+        Errors:
+            `NotFoundError` - (404) measure not found
+
+            `ETRMResponseError` - (500) server error
+
+            `UnauthorizedError` - (!200) any other error
+        """
+
+        cached_versions = await asyncio.to_thread(self.cache.get_versions,
+                                                  measure_id)
+        if cached_versions != None:
+            return list(reversed(cached_versions))
+
+        stale_versions = await asyncio.to_thread(
+            self.cache.get_stale_versions,
+            measure_id)
+        headers = None if stale_versions is None else stale_versions[1].headers
+        status, body, response_headers = await self.__get(
+            f'{API_URL}/measures/{measure_id}/',
+            f'No versions for measure {measure_id} were found',
+            'Server error occurred while retrieving versions for measure'
+                f' {measure_id}',
+            headers=headers)
+        if status == 304 and stale_versions != None:
+            measure_versions = stale_versions[0]
+            await asyncio.to_thread(self.cache.refresh_versions,
+                                    measure_id,
+                                    measure_versions)
+            return list(reversed(measure_versions))
+
+        response_body = MeasureVersionsResponse(decoding.loads(body))
+        measure_versions = sorted(map(lambda result: result.version,
+                                      response_body.versions))
+        date_committed = max(map(lambda result: result.date_committed,
+                                 response_body.versions),
+                             default=None)
+        validators = Validators.from_headers(response_headers, date_committed)
+        await asyncio.to_thread(self.cache.add_versions,
+                                measure_id,
+                                measure_versions,
+                                validators)
+        return list(reversed(measure_versions))
+
+    async def get_reference(self, reference: str) -> Reference:
+        """Returns the reference associated with `reference`
+
+        Errors:
+            `NotFoundError` - (404) reference not found
+
+            `ETRMResponseError` - (500) server error
+
+            `UnauthorizedError` - (!200) any other error
+        """
+
+        cached_reference = await asyncio.to_thread(self.cache.get_reference,
+                                                   reference)
+        if cached_reference != None:
+            return cached_reference
+
+        _, body, _ = await self.__get(
+            f'{API_URL}/references/{reference}/',
+            f'No reference with the id {reference} was found',
+            'Server error occurred while retrieving reference'
+                f' {reference}')
+        response_reference = Reference(decoding.loads(body))
+        await asyncio.to_thread(self.cache.add_reference,
+                                response_reference)
+        return response_reference
+
+    async def get_references(self,
+                             references: list[str]
+                            ) -> list[Reference | Exception]:
+        """Returns a list of references in the same order as
+        `references`.
+
+        Errors do not abort the batch, any error raised while retrieving
+        a reference is returned in place of that reference.
+        """
+
+        codes = list(dict.fromkeys(references))
+        results = await asyncio.gather(
+            *[self.get_reference(code) for code in codes],
+            return_exceptions=True)
+        cached = dict(zip(codes, results))
+        return [cached[reference] for reference in references]
+
+    async def prefetch_references(self, references: list[str]):
+        """Concurrently retrieves and caches all uncached references in
+        `references`.
+
+        Errors are ignored, they are raised once the reference is
+        requested with `get_reference()`.
+        """
+
+        await self.get_references(references)
@@ -0,0 +1,881 @@
+from __future__ import annotations
+import os
+import bisect
+import time
+import zlib
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from collections import OrderedDict
+from email.utils import format_datetime
+from typing import (
+    Any,
+    Mapping,
+    Callable,
+    Generic,
+    TypeVar,
+    Hashable,
+    NamedTuple
+)
+
+from src.etrm import decoding
+from src.etrm.models import Measure, Reference, approx_size
+
+
+MEASURE = 'measure'
+VERSIONS = 'versions'
+IDS = 'ids'
+REFERENCE = 'reference'
+
+SCHEMA_VERSION = 2
+
+MAX_MEASURE_SIZE = 256 * 1024 ** 2
+MAX_VERSION_SIZE = 8 * 1024 ** 2
+MAX_ID_SIZE = 8 * 1024 ** 2
+MAX_REFERENCE_SIZE = 8 * 1024 ** 2
+
+# size limit that leaves the current limit unchanged (see
+# `ETRMCache.resize()`)
+UNCHANGED: Any = object()
+
+_K = TypeVar('_K', bound=Hashable)
+_V = TypeVar('_V')
+
+
+def measure_size(measure: Measure) -> int:
+    """Returns the approximate in-memory size (in bytes) of `measure`,
+    including the sub-objects and table values decoded so far.
+    """
+
+    return measure.json_size + measure.decoded_size
+
+
+def reference_size(reference: Reference) -> int:
+    """Returns the approximate in-memory size (in bytes) of `reference`."""
+
+    return approx_size(reference.json)
+
+
+class LRUCache(Generic[_K, _V]):
+    """Thread-safe least recently used cache.
+
+    The cache is bounded by both the number of entries (`max_entries`)
+    and the approximate total size in bytes of all entries (`max_size`),
+    as measured by `sizeof`. The least recently used entries are evicted
+    once either limit is exceeded. A limit of `None` is unbounded. The
+    most recently used entry is never evicted.
+
+    Entries that grow in place must be recharged (see `recharge()`) to
+    update their size.
+    """
+
+    def __init__(self,
+                 max_size: int | None=None,
+                 max_entries: int | None=None,
+                 sizeof: Callable[[_V], int]=approx_size):
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self.size = 0
+        self.__entries: OrderedDict[_K, tuple[_V, int]] = OrderedDict()
+        self.__lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, key: _K) -> bool:
+        return key in self.__entries
+
+    def __getitem__(self, key: _K) -> _V:
+        with self.__lock:
+            value, _ = self.__entries[key]
+            self.__entries.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: _K, value: _V):
+        size = self.sizeof(value)
+        with self.__lock:
+            if key in self.__entries:
+                self.size -= self.__entries.pop(key)[1]
+            self.__entries[key] = (value, size)
+            self.size += size
+            self.__evict()
+
+    def recharge(self, key: _K, value: _V):
+        """Re-measures the entry for `key` if it still holds `value`,
+        evicting entries that no longer fit. The entry is not marked as
+        used.
+        """
+
+        size = self.sizeof(value)
+        with self.__lock:
+            entry = self.__entries.get(key, None)
+            if entry is None or entry[0] is not value:
+                return
+            self.size += size - entry[1]
+            self.__entries[key] = (value, size)
+            self.__evict()
+
+    def __delitem__(self, key: _K):
+        with self.__lock:
+            self.size -= self.__entries.pop(key)[1]
+
+    def get(self, key: _K, default: _V | None=None) -> _V | None:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> list[_K]:
+        with self.__lock:
+            return list(self.__entries.keys())
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.size = 0
+
+    def resize(self,
+               max_size: int | None=None,
+               max_entries: int | None=None):
+        """Sets new limits and evicts entries that no longer fit."""
+
+        with self.__lock:
+            self.max_size = max_size
+            self.max_entries = max_entries
+            self.__evict()
+
+    def __evict(self):
+        while len(self.__entries) > 1 and (
+                (self.max_size != None and self.size > self.max_size)
+                or (self.max_entries != None
+                    and len(self.__entries) > self.max_entries)):
+            _, (_, size) = self.__entries.popitem(last=False)
+            self.size -= size
+
+
+class Validators:
+    """HTTP cache validators of a cached eTRM resource."""
+
+    def __init__(self,
+                 etag: str | None=None,
+                 last_modified: str | None=None):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @classmethod
+    def from_headers(cls,
+                     headers: Mapping[str, str],
+                     date_committed: str | None=None
+                    ) -> Validators:
+        """Returns the validators found in the response headers `headers`.
+
+        Falls back to `date_committed` (an ISO 8601 date) if the response
+        does not include a `Last-Modified` header.
+        """
+
+        last_modified = headers.get('Last-Modified', None)
+        if last_modified is None and date_committed != None:
+            try:
+                committed = datetime.fromisoformat(date_committed)
+                if committed.tzinfo is None:
+                    committed = committed.replace(tzinfo=timezone.utc)
+                last_modified = format_datetime(
+                    committed.astimezone(timezone.utc), usegmt=True)
+            except ValueError:
+                pass
+        return cls(headers.get('ETag', None), last_modified)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        """Conditional request headers for the resource."""
+
+        headers: dict[str, str] = {}
+        if self.etag != None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified != None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class DiskEntry(NamedTuple):
+    """Unexpired entry of a `DiskCache`.
+
+    `size` is the size (in bytes) of the JSON encoding of `value`, and
+    `expires` is the time at which the entry expires, or `None` if it
+    never expires.
+    """
+
+    value: Any
+    size: int
+    expires: float | None
+
+
+class DiskCache:
+    """Persistent SQLite cache for eTRM API response data.
+
+    Entries are stored as compressed JSON, keyed by their kind and key.
+    Entries expire once their TTL (in seconds) has passed, entries
+    without a TTL never expire.
+
+    Cache failures are never raised, a failed read is treated as a miss
+    and a failed write is dropped. If the database at `path` cannot be
+    opened (e.g., its directory is read-only or the database is locked),
+    `available` is false and the cache must not be used. `ETRMCache`
+    ignores an unavailable disk cache.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__conn: sqlite3.Connection | None = None
+        try:
+            dir_path = os.path.dirname(path)
+            if dir_path != '' and not os.path.exists(dir_path):
+                os.makedirs(dir_path)
+            self.__conn = self.__connect(path)
+        except (OSError, sqlite3.Error):
+            self.__conn = None
+
+    @property
+    def available(self) -> bool:
+        """Whether the database was opened."""
+
+        return self.__conn != None
+
+    def __connect(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path,
+                               check_same_thread=False,
+                               isolation_level=None)
+        try:
+            self.__conn = conn
+            self.__init_schema()
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def __init_schema(self):
+        with self.__lock:
+            user_version = self.__conn.execute(
+                'PRAGMA user_version').fetchone()[0]
+            if user_version != SCHEMA_VERSION:
+                self.__conn.execute('DROP TABLE IF EXISTS entries')
+            self.__conn.execute('PRAGMA journal_mode=WAL')
+            self.__conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                '    kind TEXT NOT NULL,'
+                '    key TEXT NOT NULL,'
+                '    value BLOB NOT NULL,'
+                '    expires REAL,'
+                '    etag TEXT,'
+                '    last_modified TEXT,'
+                '    PRIMARY KEY (kind, key)'
+                ')')
+            self.__conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def get(self, kind: str, key: str) -> Any | None:
+        """Returns the decoded value of the unexpired entry for `key`."""
+
+        entry = self.get_entry(kind, key)
+        return None if entry is None else entry.value
+
+    def get_entry(self, kind: str, key: str) -> DiskEntry | None:
+        """Returns the unexpired entry for `key`."""
+
+        try:
+            with self.__lock:
+                row = self.__conn.execute(
+                    'SELECT value, expires FROM entries'
+                    ' WHERE kind = ? AND key = ?'
+                    ' AND (expires IS NULL OR expires > ?)',
+                    (kind, key, time.time())).fetchone()
+        except sqlite3.Error:
+            return None
+
+        if row is None:
+            return None
+
+        try:
+            data = zlib.decompress(row[0])
+            return DiskEntry(decoding.loads(data), len(data), row[1])
+        except (zlib.error, ValueError):
+            self.delete(kind, key)
+            return None
+
+    def get_prefixed(self,
+                     kind: str,
+                     prefix: str
+                    ) -> list[tuple[str, Any, float | None]]:
+        """Returns the keys, decoded values and expiry times of all
+        unexpired entries with keys starting with `prefix`.
+        """
+
+        try:
+            with self.__lock:
+                rows = self.__conn.execute(
+                    'SELECT key, value, expires FROM entries'
+                    ' WHERE kind = ? AND substr(key, 1, ?) = ?'
+                    ' AND (expires IS NULL OR expires > ?)',
+                    (kind, len(prefix), prefix, time.time())).fetchall()
+        except sqlite3.Error:
+            return []
+
+        entries: list[tuple[str, Any, float | None]] = []
+        for key, blob, expires in rows:
+            value = self.__decode(kind, key, blob)
+            if value != None:
+                entries.append((key, value, expires))
+        return entries
+
+    def get_stale(self,
+                  kind: str,
+                  key: str
+                 ) -> tuple[Any, Validators] | None:
+        """Returns the decoded value and validators of the entry for `key`,
+        even if the entry has expired.
+        """
+
+        try:
+            with self.__lock:
+                row = self.__conn.execute(
+                    'SELECT value, etag, last_modified FROM entries'
+                    ' WHERE kind = ? AND key = ?',
+                    (kind, key)).fetchone()
+        except sqlite3.Error:
+            return None
+
+        if row is None:
+            return None
+
+        value = self.__decode(kind, key, row[0])
+        if value is None:
+            return None
+
+        return (value, Validators(row[1], row[2]))
+
+    def __decode(self, kind: str, key: str, blob: bytes) -> Any | None:
+        try:
+            return decoding.loads(zlib.decompress(blob))
+        except (zlib.error, ValueError):
+            self.delete(kind, key)
+            return None
+
+    def set(self,
+            kind: str,
+            key: str,
+            value: Any,
+            ttl: float | None=None,
+            validators: Validators | None=None):
+        """Stores `value` under `key`, replacing any existing entry."""
+
+        blob = zlib.compress(decoding.dumps(value), 1)
+        expires = None if ttl is None else time.time() + ttl
+        validators = validators or Validators()
+        try:
+            with self.__lock:
+                self.__conn.execute(
+                    'INSERT OR REPLACE INTO entries'
+                    ' (kind, key, value, expires, etag, last_modified)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)',
+                    (kind,
+                     key,
+                     blob,
+                     expires,
+                     validators.etag,
+                     validators.last_modified))
+        except sqlite3.Error:
+            pass
+
+    def touch(self, kind: str, key: str, ttl: float | None=None):
+        """Renews the TTL of the entry for `key`."""
+
+        expires = None if ttl is None else time.time() + ttl
+        try:
+            with self.__lock:
+                self.__conn.execute(
+                    'UPDATE entries SET expires = ?'
+                    ' WHERE kind = ? AND key = ?',
+                    (expires, kind, key))
+        except sqlite3.Error:
+            pass
+
+    def delete(self, kind: str, key: str):
+        try:
+            with self.__lock:
+                self.__conn.execute(
+                    'DELETE FROM entries WHERE kind = ? AND key = ?',
+                    (kind, key))
+        except sqlite3.Error:
+            pass
+
+    def purge(self):
+        """Removes all expired entries."""
+
+        try:
+            with self.__lock:
+                self.__conn.execute(
+                    'DELETE FROM entries WHERE expires <= ?',
+                    (time.time(),))
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        """Removes all entries."""
+
+        try:
+            with self.__lock:
+                self.__conn.execute('DELETE FROM entries')
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        if self.__conn is None:
+            return
+
+        try:
+            with self.__lock:
+                self.__conn.close()
+        except sqlite3.Error:
+            pass
+
+
+class IDIndex:
+    """Sparse index of the measure IDs of one use category.
+
+    Cached IDs are stored as sorted, non-overlapping segments of
+    consecutive IDs. Overlapping and adjacent segments are merged, with
+    newer IDs replacing older ones.
+
+    `expires` is the time at which the earliest added page of IDs
+    expires, or `None` if no page expires.
+    """
+
+    def __init__(self, count: int=-1):
+        self.count = count
+        self.expires: float | None = None
+        self.__starts: list[int] = []
+        self.__segments: list[list[str]] = []
+
+    def __len__(self) -> int:
+        return sum(map(len, self.__segments))
+
+    @property
+    def size(self) -> int:
+        """Approximate in-memory size (in bytes) of the cached IDs."""
+
+        return sum(map(approx_size, self.__segments))
+
+    def __window(self, offset: int, limit: int) -> tuple[int, int]:
+        stop = offset + limit
+        if self.count >= 0:
+            stop = min(stop, self.count)
+        return (offset, max(offset, stop))
+
+    def get(self, offset: int, limit: int) -> list[str] | None:
+        """Returns the IDs in the window of `limit` IDs starting at
+        `offset`, or `None` if any part of the window is not cached.
+
+        The window is truncated to the total count of IDs, if known.
+        """
+
+        start, stop = self.__window(offset, limit)
+        if start == stop:
+            return [] if self.count >= 0 else None
+
+        i = bisect.bisect_right(self.__starts, start) - 1
+        if i < 0:
+            return None
+
+        seg_start = self.__starts[i]
+        segment = self.__segments[i]
+        if seg_start + len(segment) < stop:
+            return None
+        return segment[start - seg_start:stop - seg_start]
+
+    def missing(self, offset: int, limit: int) -> list[tuple[int, int]]:
+        """Returns the `(offset, limit)` windows that are not cached within
+        the window of `limit` IDs starting at `offset`.
+        """
+
+        start, stop = self.__window(offset, limit)
+        gaps: list[tuple[int, int]] = []
+        cursor = start
+        i = max(bisect.bisect_right(self.__starts, start) - 1, 0)
+        while cursor < stop and i < len(self.__starts):
+            seg_start = self.__starts[i]
+            seg_stop = seg_start + len(self.__segments[i])
+            if seg_start >= stop:
+                break
+            if seg_start > cursor:
+                gaps.append((cursor, seg_start - cursor))
+            cursor = max(cursor, seg_stop)
+            i += 1
+        if cursor < stop:
+            gaps.append((cursor, stop - cursor))
+        return gaps
+
+    def add(self,
+            offset: int,
+            measure_ids: list[str],
+            expires: float | None=None):
+        """Adds the IDs starting at `offset`, merging them with any
+        overlapping or adjacent cached IDs.
+
+        `expires` is the time at which the IDs expire, if any.
+        """
+
+        if expires != None and (self.expires is None
+                                or expires < self.expires):
+            self.expires = expires
+
+        if measure_ids == []:
+            return
+
+        stop = offset + len(measure_ids)
+        lo = bisect.bisect_left(self.__starts, offset)
+        if lo > 0:
+            prev_stop = self.__starts[lo - 1] + len(self.__segments[lo - 1])
+            if prev_stop >= offset:
+                lo -= 1
+        hi = bisect.bisect_right(self.__starts, stop)
+
+        merged = list(measure_ids)
+        merged_start = offset
+        if lo < hi:
+            first_start = self.__starts[lo]
+            if first_start < offset:
+                merged = self.__segments[lo][:offset - first_start] + merged
+                merged_start = first_start
+
+            last_start = self.__starts[hi - 1]
+            last_segment = self.__segments[hi - 1]
+            if last_start + len(last_segment) > stop:
+                merged.extend(last_segment[stop - last_start:])
+
+        self.__starts[lo:hi] = [merged_start]
+        self.__segments[lo:hi] = [merged]
+
+
+class ETRMCache:
+    """Cache for eTRM API response data.
+
+    Decreases time required for repeat API calls for the same data.
+
+    If an available `DiskCache` is provided, response data is also
+    persisted to disk so that it survives restarts. Published measures
+    never change, so they never expire. Draft measures, version lists,
+    measure ID pages and references expire after `measure_ttl`,
+    `version_ttl`, `id_ttl` and `reference_ttl` seconds respectively.
+
+    Expired version lists and measure ID pages are kept on disk alongside
+    their validators so that they can be revalidated with a conditional
+    request rather than downloaded again. In-memory version lists and
+    measure IDs expire with their disk entries.
+
+    In-memory data is evicted least recently used first once its
+    approximate size exceeds `max_measure_size`, `max_version_size`,
+    `max_id_size` or `max_reference_size` bytes.
+    """
+
+    def __init__(self,
+                 disk: DiskCache | None=None,
+                 measure_ttl: float=60 * 60,
+                 version_ttl: float=60 * 60 * 24,
+                 id_ttl: float=60 * 60 * 24,
+                 reference_ttl: float=60 * 60 * 24 * 7,
+                 max_measure_size: int | None=MAX_MEASURE_SIZE,
+                 max_version_size: int | None=MAX_VERSION_SIZE,
+                 max_id_size: int | None=MAX_ID_SIZE,
+                 max_reference_size: int | None=MAX_REFERENCE_SIZE):
+        if disk != None and not disk.available:
+            disk = None
+        self.disk = disk
+        self.measure_ttl = measure_ttl
+        self.version_ttl = version_ttl
+        self.id_ttl = id_ttl
+        self.reference_ttl = reference_ttl
+        self.id_caches = LRUCache[str | None, IDIndex](
+            max_id_size,
+            sizeof=lambda id_index: id_index.size)
+        self.__id_lock = threading.Lock()
+        self.version_cache = LRUCache[str, tuple[list[str], float | None]](
+            max_version_size)
+        self.measure_cache = LRUCache[str, Measure](max_measure_size,
+                                                    sizeof=measure_size)
+        self.reference_cache = LRUCache[str, Reference](
+            max_reference_size,
+            sizeof=reference_size)
+
+    def resize(self,
+               max_measure_size: int | None=UNCHANGED,
+               max_version_size: int | None=UNCHANGED,
+               max_id_size: int | None=UNCHANGED,
+               max_reference_size: int | None=UNCHANGED):
+        """Sets new in-memory size limits, evicting data that no longer
+        fits.
+
+        Limits that are not given (or are `UNCHANGED`) are kept.
+        """
+
+        if max_measure_size is not UNCHANGED:
+            self.measure_cache.resize(max_measure_size)
+        if max_version_size is not UNCHANGED:
+            self.version_cache.resize(max_version_size)
+        if max_id_size is not UNCHANGED:
+            self.id_caches.resize(max_id_size)
+        if max_reference_size is not UNCHANGED:
+            self.reference_cache.resize(max_reference_size)
+
+    def __ids_key(self,
+                  offset: int,
+                  limit: int,
+                  use_category: str | None
+                 ) -> str:
+        return f'{use_category or ""}/{offset}/{limit}'
+
+    def __expiry(self, ttl: float | None) -> float | None:
+        return None if ttl is None else time.time() + ttl
+
+    def get_ids(self,
+                offset: int,
+                limit: int,
+                use_category: str | None=None
+               ) -> tuple[list[str], int] | None:
+        """Returns the cached measure IDs in the window of `limit` IDs
+        starting at `offset` and the total count of measure IDs.
+
+        All unexpired cached pages of the use category are loaded from
+        disk the first time its IDs are requested, and again once any
+        page held in memory expires.
+
+        Returns `None` if any part of the window is not cached.
+        """
+
+        cached_ids = self.__get_ids(offset, limit, use_category)
+        if (cached_ids != None
+                or self.disk is None
+                or use_category in self.id_caches):
+            return cached_ids
+
+        prefix = f'{use_category or ""}/'
+        for key, page, expires in self.disk.get_prefixed(IDS, prefix):
+            page_offset = int(key.split('/')[1])
+            self.__add_ids(page['ids'],
+                           page_offset,
+                           page['count'],
+                           use_category,
+                           expires)
+        return self.__get_ids(offset, limit, use_category)
+
+    def __get_ids(self,
+                  offset: int,
+                  limit: int,
+                  use_category: str | None=None
+                 ) -> tuple[list[str], int] | None:
+        with self.__id_lock:
+            id_index = self.__id_index(use_category)
+            if id_index is None:
+                return None
+
+            cached_ids = id_index.get(offset, limit)
+            if cached_ids is None:
+                return None
+            return (cached_ids, id_index.count)
+
+    def missing_ids(self,
+                    offset: int,
+                    limit: int,
+                    use_category: str | None=None
+                   ) -> list[tuple[int, int]]:
+        """Returns the `(offset, limit)` windows of measure IDs that are
+        not cached within the window of `limit` IDs starting at `offset`.
+        """
+
+        with self.__id_lock:
+            id_index = self.__id_index(use_category)
+            if id_index is None:
+                return [(offset, limit)]
+            return id_index.missing(offset, limit)
+
+    def __id_index(self, use_category: str | None) -> IDIndex | None:
+        """Returns the ID index of `use_category`, dropping it if any of
+        its pages have expired.
+
+        Must be called while holding the ID lock.
+        """
+
+        id_index = self.id_caches.get(use_category)
+        if (id_index != None
+                and id_index.expires != None
+                and id_index.expires <= time.time()):
+            del self.id_caches[use_category]
+            return None
+        return id_index
+
+    def get_stale_ids(self,
+                      offset: int,
+                      limit: int,
+                      use_category: str | None=None
+                     ) -> tuple[list[str], int, Validators] | None:
+        if self.disk is None:
+            return None
+
+        key = self.__ids_key(offset, limit, use_category)
+        entry = self.disk.get_stale(IDS, key)
+        if entry is None:
+            return None
+
+        page, validators = entry
+        return (page['ids'], page['count'], validators)
+
+    def refresh_ids(self,
+                    measure_ids: list[str],
+                    offset: int,
+                    limit: int,
+                    count: int,
+                    use_category: str | None=None):
+        """Re-adds revalidated measure IDs and renews their TTL."""
+
+        self.__add_ids(measure_ids,
+                       offset,
+                       count,
+                       use_category,
+                       self.__expiry(self.id_ttl))
+        if self.disk != None:
+            key = self.__ids_key(offset, limit, use_category)
+            self.disk.touch(IDS, key, ttl=self.id_ttl)
+
+    def add_ids(self,
+                measure_ids: list[str],
+                offset: int,
+                limit: int,
+                count: int,
+                use_category: str | None=None,
+                validators: Validators | None=None):
+        self.__add_ids(measure_ids,
+                       offset,
+                       count,
+                       use_category,
+                       self.__expiry(self.id_ttl))
+        if self.disk != None:
+            self.disk.set(IDS,
+                          self.__ids_key(offset, limit, use_category),
+                          {'ids': measure_ids, 'count': count},
+                          ttl=self.id_ttl,
+                          validators=validators)
+
+    def __add_ids(self,
+                  measure_ids: list[str],
+                  offset: int,
+                  count: int,
+                  use_category: str | None=None,
+                  expires: float | None=None):
+        with self.__id_lock:
+            id_index = self.__id_index(use_category)
+            if id_index is None:
+                id_index = IDIndex()
+            id_index.count = count
+            id_index.add(offset, measure_ids, expires)
+            self.id_caches[use_category] = id_index
+
+    def get_versions(self, measure_id: str) -> list[str] | None:
+        """Returns the unexpired cached versions of `measure_id`."""
+
+        cached = self.version_cache.get(measure_id, None)
+        if cached != None:
+            versions, expires = cached
+            if expires is None or expires > time.time():
+                return versions
+
+        if self.disk is None:
+            return None
+
+        entry = self.disk.get_entry(VERSIONS, measure_id)
+        if entry is None:
+            return None
+
+        self.version_cache[measure_id] = (entry.value, entry.expires)
+        return entry.value
+
+    def get_stale_versions(self,
+                           measure_id: str
+                          ) -> tuple[list[str], Validators] | None:
+        if self.disk is None:
+            return None
+        return self.disk.get_stale(VERSIONS, measure_id)
+
+    def refresh_versions(self, measure_id: str, versions: list[str]):
+        """Re-adds revalidated versions and renews their TTL."""
+
+        self.version_cache[measure_id] = (versions,
+                                          self.__expiry(self.version_ttl))
+        if self.disk != None:
+            self.disk.touch(VERSIONS, measure_id, ttl=self.version_ttl)
+
+    def add_versions(self,
+                     measure_id: str,
+                     versions: list[str],
+                     validators: Validators | None=None):
+        self.version_cache[measure_id] = (versions,
+                                          self.__expiry(self.version_ttl))
+        if self.disk != None:
+            self.disk.set(VERSIONS,
+                          measure_id,
+                          versions,
+                          ttl=self.version_ttl,
+                          validators=validators)
+
+    def get_measure(self, version_id: str) -> Measure | None:
+        measure = self.measure_cache.get(version_id, None)
+        if measure != None or self.disk is None:
+            return measure
+
+        entry = self.disk.get_entry(MEASURE, version_id)
+        if entry is None:
+            return None
+
+        measure = Measure(entry.value, entry.size)
+        self.__cache_measure(measure)
+        return measure
+
+    def __cache_measure(self, measure: Measure):
+        """Adds `measure` to the in-memory cache, charging the cache for
+        the sub-objects and table values of `measure` as they are
+        decoded.
+        """
+
+        version_id = measure.full_version_id
+        measure.on_resize = (
+            lambda measure: self.measure_cache.recharge(version_id, measure))
+        self.measure_cache[version_id] = measure
+
+    def add_measure(self, measure: Measure):
+        self.__cache_measure(measure)
+        if self.disk != None:
+            ttl = None if measure.is_published else self.measure_ttl
+            self.disk.set(MEASURE,
+                          measure.full_version_id,
+                          measure._json,
+                          ttl=ttl)
+
+    def get_reference(self, reference_code: str) -> Reference | None:
+        reference = self.reference_cache.get(reference_code, None)
+        if reference != None or self.disk is None:
+            return reference
+
+        reference_json = self.disk.get(REFERENCE, reference_code)
+        if reference_json is None:
+            return None
+
+        reference = Reference(reference_json)
+        self.reference_cache[reference_code] = reference
+        return reference
+
+    def add_reference(self, reference: Reference):
+        self.reference_cache[reference.reference_code] = reference
+        if self.disk != None:
+            self.disk.set(REFERENCE,
+                          reference.reference_code,
+                          reference.json,
+                          ttl=self.reference_ttl)
@@ -0,0 +1,504 @@
+from __future__ import annotations
+import itertools
+import numpy as np
+import numpy.typing as npt
+from typing import Any, Callable, NamedTuple
+
+
+class TableRow(NamedTuple):
+    """Row of a value table or calculation.
+
+    `index` is the index of the row within `store`, the columnar store
+    that the row was read from.
+    """
+
+    index: int
+    keys: tuple[str | None, ...]
+    values: tuple[str | None, ...]
+    store: ColumnarValues
+
+    @property
+    def numbers(self) -> tuple[float, ...]:
+        """The values as floats, with null and non-numeric values as
+        `NaN`.
+
+        The floats are read from the numeric columns of `store` (see
+        `ColumnarValues.numeric()`).
+        """
+
+        return tuple(float(self.store.numeric(i)[self.index])
+                        for i
+                        in range(self.store.key_count,
+                                 self.store.column_count))
+
+
+def _row_size(row: TableRow) -> int:
+    """Returns the approximate in-memory size (in bytes) of `row`."""
+
+    size = 72 + 56 + 8 * len(row.keys) + 56 + 8 * len(row.values)
+    for cell in itertools.chain(row.keys, row.values):
+        if cell != None:
+            size += 49 + len(cell)
+    return size
+
+
+class RowIndex:
+    """Hash index of table rows by their determinant keys.
+
+    Rows are indexed by each key prefix length on first use, so finding
+    the `k` rows of a full or partial key is O(k).
+
+    `nbytes` is the approximate in-memory size of the rows and indexes,
+    `on_resize` is called with the size of each index as it is built.
+    """
+
+    __slots__ = ('key_count', 'rows', 'nbytes', '__on_resize', '__prefixes')
+
+    def __init__(self,
+                 rows: list[TableRow],
+                 key_count: int,
+                 on_resize: Callable[[int], None] | None=None):
+        self.key_count = key_count
+        self.rows = rows
+        self.nbytes = 56 + 8 * len(rows) + sum(map(_row_size, rows))
+        self.__on_resize = on_resize
+        self.__prefixes: dict[int, dict[tuple, list[TableRow]]] = {}
+
+    def __index(self, prefix_len: int) -> dict[tuple, list[TableRow]]:
+        if prefix_len > self.key_count:
+            raise ValueError(f'expected at most {self.key_count} keys,'
+                             f' got {prefix_len}')
+
+        index = self.__prefixes.get(prefix_len, None)
+        if index is None:
+            index = {}
+            for row in self.rows:
+                index.setdefault(row.keys[:prefix_len], []).append(row)
+            self.__prefixes[prefix_len] = index
+
+            # entries, their key tuples and row lists
+            size = (64 + len(index) * (100 + 56 + 8 * prefix_len + 56)
+                        + 8 * len(self.rows))
+            self.nbytes += size
+            if self.__on_resize != None:
+                self.__on_resize(size)
+        return index
+
+    def get(self, keys: tuple[str | None, ...]) -> TableRow | None:
+        """Returns the first row whose leading determinant keys are
+        `keys`, or `None` if no row matches.
+        """
+
+        rows = self.__index(len(keys)).get(keys, None)
+        return None if rows is None else rows[0]
+
+    def find(self, keys: tuple[str | None, ...]) -> list[TableRow]:
+        """Returns the rows whose leading determinant keys are `keys`."""
+
+        return list(self.__index(len(keys)).get(keys, []))
+
+
+class ColumnarValues:
+    """Column-oriented store of value table rows.
+
+    The first `key_count` columns are determinant key columns. Each key
+    column is dictionary encoded as an array of its distinct labels and
+    an `int32` array of label codes, with `-1` as the code of null
+    cells.
+
+    All other columns are value columns. Value columns of numbers are
+    stored as `float64` arrays with null cells as `NaN`, along with the
+    format of the column's numbers (`1.0` or `1`) and the text of each
+    cell that the format does not reproduce (e.g., `0.10`). Other value
+    columns are stored as fixed-width unicode arrays with null cells as
+    `''`.
+
+    Every column has a null mask. Numeric views of key and text columns
+    are parsed on first access.
+
+    Non-null cells are read back as `str`.
+
+    `nbytes` is the approximate in-memory size of the store, including
+    the numeric views and the row index, `on_resize` is called with the
+    size of each as it is built.
+    """
+
+    __slots__ = (
+        'key_count',
+        'row_count',
+        'column_count',
+        '__labels',
+        '__codes',
+        '__values',
+        '__formats',
+        '__texts',
+        '__nulls',
+        '__numeric',
+        '__row_index',
+        '__on_resize'
+    )
+
+    def __init__(self,
+                 rows: list[list[Any]],
+                 key_count: int,
+                 on_resize: Callable[[int], None] | None=None):
+        self.key_count = key_count
+        self.row_count = len(rows)
+        self.__on_resize = on_resize
+        self.__labels: list[npt.NDArray[np.str_]] = []
+        self.__codes: list[npt.NDArray[np.int32]] = []
+        self.__values: list[npt.NDArray[np.float64 | np.str_]] = []
+        self.__formats: list[_NumberFormat | None] = []
+        self.__texts: list[dict[int, str]] = []
+        self.__nulls: list[npt.NDArray[np.bool_]] = []
+        self.__numeric: dict[int, npt.NDArray[np.float64]] = {}
+        self.__row_index: RowIndex | None = None
+
+        columns = list(itertools.zip_longest(*rows, fillvalue=None))
+        while len(columns) < key_count:
+            columns.append((None,) * self.row_count)
+        self.column_count = len(columns)
+
+        for column in columns[:key_count]:
+            label_codes: dict[str, int] = {}
+            codes = np.fromiter(
+                (-1 if cell is None
+                    else label_codes.setdefault(str(cell), len(label_codes))
+                    for cell
+                    in column),
+                dtype=np.int32,
+                count=self.row_count)
+            self.__labels.append(np.array(list(label_codes), dtype=np.str_))
+            self.__codes.append(codes)
+            self.__nulls.append(codes == -1)
+
+        for column in columns[key_count:]:
+            nulls = np.fromiter((cell is None for cell in column),
+                                dtype=np.bool_,
+                                count=self.row_count)
+            cells = ['' if cell is None else str(cell) for cell in column]
+            numbers = _parse_numbers(cells, nulls)
+            if numbers is None:
+                self.__values.append(np.array(cells, dtype=np.str_))
+                self.__formats.append(None)
+                self.__texts.append({})
+            else:
+                values, number_format, texts = numbers
+                self.__values.append(values)
+                self.__formats.append(number_format)
+                self.__texts.append(texts)
+            self.__nulls.append(nulls)
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self.row_count, self.column_count)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = itertools.chain(self.__labels,
+                                 self.__codes,
+                                 self.__values,
+                                 self.__nulls,
+                                 self.__numeric.values())
+        size = 200 + sum(112 + array.nbytes for array in arrays)
+        for texts in self.__texts:
+            size += 64 + sum(100 + 49 + len(text) for text in texts.values())
+        if self.__row_index != None:
+            size += self.__row_index.nbytes
+        return size
+
+    def __resized(self, size: int):
+        if self.__on_resize != None:
+            self.__on_resize(size)
+
+    def key_codes(self,
+                  index: int
+                 ) -> tuple[npt.NDArray[np.str_], npt.NDArray[np.int32]]:
+        """Returns the distinct labels and the label codes of the key
+        column at `index`.
+        """
+
+        if not 0 <= index < self.key_count:
+            raise IndexError(f'no key column at index {index}')
+
+        return (self.__labels[index], self.__codes[index])
+
+    def column(self, index: int) -> npt.NDArray[np.str_]:
+        """Returns the column at `index`, with null cells as `''`."""
+
+        if not 0 <= index < self.column_count:
+            raise IndexError(f'no column at index {index}')
+
+        if index >= self.key_count:
+            if self.__formats[index - self.key_count] != None:
+                return self.__cells(index).astype(np.str_)
+            return self.__values[index - self.key_count]
+
+        labels, codes = self.key_codes(index)
+        return np.append(labels, np.array([''], dtype=np.str_))[codes]
+
+    def __cells(self, index: int) -> npt.NDArray[np.object_]:
+        """Returns the column at `index` as `str` objects, with null cells
+        as `''`.
+        """
+
+        number_format = (None if index < self.key_count
+                            else self.__formats[index - self.key_count])
+        if number_format is None:
+            return self.column(index).astype(np.object_)
+
+        column = np.full(self.row_count, '', dtype=np.object_)
+        present = ~self.__nulls[index]
+        values = self.__values[index - self.key_count][present]
+        column[present] = np.array(number_format(values), dtype=np.object_)
+        for row, text in self.__texts[index - self.key_count].items():
+            column[row] = text
+        return column
+
+    def null_mask(self, index: int) -> npt.NDArray[np.bool_]:
+        """Returns the null mask of the column at `index`."""
+
+        if not 0 <= index < self.column_count:
+            raise IndexError(f'no column at index {index}')
+
+        return self.__nulls[index]
+
+    def numeric(self, index: int) -> npt.NDArray[np.float64]:
+        """Returns the column at `index` as floats, with null and
+        non-numeric cells as `NaN`.
+        """
+
+        if (self.key_count <= index < self.column_count
+                and self.__formats[index - self.key_count] != None):
+            return self.__values[index - self.key_count]
+
+        numeric = self.__numeric.get(index, None)
+        if numeric is not None:
+            return numeric
+
+        column = self.column(index)
+        try:
+            numeric = np.where(column == '', 'nan', column).astype(np.float64)
+        except ValueError:
+            numeric = np.fromiter(map(_to_float, column),
+                                  dtype=np.float64,
+                                  count=self.row_count)
+        numeric[self.null_mask(index)] = np.nan
+        self.__numeric[index] = numeric
+        self.__resized(112 + numeric.nbytes)
+        return numeric
+
+    def key_mask(self, index: int, label: str) -> npt.NDArray[np.bool_]:
+        """Returns a mask of the rows whose key column at `index` is
+        `label`.
+        """
+
+        labels, codes = self.key_codes(index)
+        matches = np.flatnonzero(labels == label)
+        if matches.size == 0:
+            return np.zeros(self.row_count, dtype=np.bool_)
+        return codes == matches[0]
+
+    @property
+    def row_index(self) -> RowIndex:
+        """Index of the rows by determinant keys, built on first access."""
+
+        if self.__row_index is None:
+            key_count = self.key_count
+            rows = [TableRow(i,
+                             tuple(row[:key_count]),
+                             tuple(row[key_count:]),
+                             self)
+                        for i, row
+                        in enumerate(self.rows())]
+            self.__row_index = RowIndex(rows, key_count, self.__resized)
+            self.__resized(self.__row_index.nbytes)
+        return self.__row_index
+
+    def rows(self,
+             mask: npt.NDArray[np.bool_] | None=None,
+             null: str | None=None
+            ) -> list[list[str | None]]:
+        """Returns the rows selected by `mask` (or all rows) with null
+        cells as `null`.
+        """
+
+        if self.column_count == 0:
+            row_count = self.row_count if mask is None else int(mask.sum())
+            return [[] for _ in range(row_count)]
+
+        columns: list[npt.NDArray[np.object_]] = []
+        for i in range(self.column_count):
+            column = self.__cells(i)
+            if mask is not None:
+                column = column[mask]
+            if null != '':
+                nulls = self.null_mask(i)
+                column[nulls if mask is None else nulls[mask]] = null
+            columns.append(column)
+        return np.column_stack(columns).tolist()
+
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+_NumberFormat = Callable[[npt.NDArray[np.float64]], list[str]]
+
+
+def _format_floats(values: npt.NDArray[np.float64]) -> list[str]:
+    """Formats `values` as `repr()` does."""
+
+    return list(map(repr, values.tolist()))
+
+
+def _format_integral(values: npt.NDArray[np.float64]) -> list[str]:
+    """Formats `values` as `repr()` does, without the `.0` of integral
+    values.
+    """
+
+    integral = (values == np.trunc(values)) & (np.abs(values) < 1e16)
+    integers = np.where(integral, values, 0).astype(np.int64)
+    cells = list(map(str, integers.tolist()))
+    fractions = np.flatnonzero(~integral)
+    for row, value in zip(fractions.tolist(), values[fractions].tolist()):
+        cells[row] = repr(value)
+    return cells
+
+
+def _parse_numbers(cells: list[str],
+                   nulls: npt.NDArray[np.bool_]
+                  ) -> tuple[npt.NDArray[np.float64],
+                             _NumberFormat,
+                             dict[int, str]] | None:
+    """Parses the value column `cells` as floats.
+
+    Returns the floats, with null cells as `NaN`, the format that
+    reproduces the most cells and the text of each cell that it does
+    not reproduce. Returns `None` if a non-null cell is not a number, or
+    if more than a quarter of the cells are not reproduced.
+    """
+
+    # null cells as `NaN`, which every format reproduces
+    texts = np.array(cells, dtype=np.object_)
+    texts[nulls] = 'nan'
+    try:
+        values = texts.astype(np.float64)
+    except ValueError:
+        return None
+
+    # the formats differ only in integral values, so the format of the
+    # first cell is tried first
+    texts = texts.tolist()
+    number_formats = [_format_floats, _format_integral]
+    first = next((cell for cell in cells if cell != ''), '')
+    if '.' not in first:
+        number_formats.reverse()
+
+    best: tuple[_NumberFormat, list[int]] | None = None
+    for number_format in number_formats:
+        formatted = number_format(values)
+        if formatted == texts:
+            return (values, number_format, {})
+
+        misses = list(itertools.compress(range(len(texts)),
+                                         map(str.__ne__, texts, formatted)))
+        if best is None or len(misses) < len(best[1]):
+            best = (number_format, misses)
+
+    number_format, misses = best
+    if len(misses) > len(cells) // 4:
+        return None
+    return (values, number_format, {row: cells[row] for row in misses})
+
+
+class ExclusionIndex:
+    """Bitset of the excluded label pairs of a two determinant exclusion
+    table.
+
+    Labels are identified by their ordinals within each determinant,
+    labels of the table that are not among `ordinals` are given new
+    ordinals. Excluded pairs are stored as a bit matrix, packed eight
+    pairs to a byte.
+
+    A pair of labels is allowed unless the table excludes it.
+    """
+
+    __slots__ = ('__ordinals', '__bits')
+
+    def __init__(self,
+                 values: list[tuple[str, str, bool]],
+                 ordinals: tuple[dict[str, int], dict[str, int]]):
+        self.__ordinals = (dict(ordinals[0]), dict(ordinals[1]))
+        sizes = [max(label_ordinals.values(), default=-1) + 1
+                    for label_ordinals
+                    in self.__ordinals]
+        pairs: list[tuple[int, int, bool]] = []
+        for label_a, label_b, allowed in values:
+            ordinal_pair: list[int] = []
+            for i, label in enumerate((label_a, label_b)):
+                ordinal = self.__ordinals[i].get(label, None)
+                if ordinal is None:
+                    ordinal = sizes[i]
+                    self.__ordinals[i][label] = ordinal
+                    sizes[i] += 1
+                ordinal_pair.append(ordinal)
+            pairs.append((*ordinal_pair, bool(allowed)))
+
+        excluded = np.zeros(sizes, dtype=np.bool_)
+        for ordinal_a, ordinal_b, allowed in pairs:
+            excluded[ordinal_a, ordinal_b] = not allowed
+        self.__bits = np.packbits(excluded, axis=1)
+
+    def encode(self,
+               index: int,
+               labels: npt.ArrayLike
+              ) -> npt.NDArray[np.intp]:
+        """Returns the ordinals of `labels` within the determinant at
+        `index` (0 or 1), with `-1` as the ordinal of unknown labels.
+        """
+
+        label_ordinals = self.__ordinals[index]
+        uniques, inverse = np.unique(np.asarray(labels, dtype=np.str_),
+                                     return_inverse=True)
+        unique_ordinals = np.fromiter(
+            (label_ordinals.get(label, -1) for label in uniques.tolist()),
+            dtype=np.intp,
+            count=uniques.size)
+        return unique_ordinals[inverse]
+
+    def excluded_mask(self,
+                      ordinals_a: npt.ArrayLike,
+                      ordinals_b: npt.ArrayLike
+                     ) -> npt.NDArray[np.bool_]:
+        """Returns a mask of the excluded label pairs, given the ordinals
+        of the labels of each pair.
+        """
+
+        ordinals_a = np.asarray(ordinals_a, dtype=np.intp)
+        ordinals_b = np.asarray(ordinals_b, dtype=np.intp)
+        excluded = np.zeros(ordinals_a.shape, dtype=np.bool_)
+        known = (ordinals_a >= 0) & (ordinals_b >= 0)
+        known_a = ordinals_a[known]
+        known_b = ordinals_b[known]
+        bits = self.__bits[known_a, known_b >> 3] >> (7 - (known_b & 7))
+        excluded[known] = (bits & 1).astype(np.bool_)
+        return excluded
+
+    def allowed_mask(self,
+                     labels_a: npt.ArrayLike,
+                     labels_b: npt.ArrayLike
+                    ) -> npt.NDArray[np.bool_]:
+        """Returns a mask of the allowed label pairs."""
+
+        return ~self.excluded_mask(self.encode(0, labels_a),
+                                   self.encode(1, labels_b))
+
+    def is_allowed(self, label_a: str, label_b: str) -> bool:
+        return bool(self.allowed_mask([label_a], [label_b])[0])
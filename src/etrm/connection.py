@@ -1,21 +1,42 @@
+from __future__ import annotations
+import io
+import os
 import re
+import csv
+import threading
 import requests
-
+import urllib3
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Hashable, Iterator, Mapping, TypeVar
+from requests.adapters import HTTPAdapter
+
+from src.etrm import decoding
+from src.etrm.cache import (
+    ETRMCache,
+    Validators,
+    MEASURE,
+    VERSIONS,
+    IDS,
+    REFERENCE,
+    UNCHANGED
+)
 from src.etrm.models import (
     MeasuresResponse,
     MeasureVersionsResponse,
     Measure,
     Reference
 )
-from src.exceptions import (
-    ETRMResponseError,
-    UnauthorizedError,
-    NotFoundError
-)
+from src.lookups import USE_CATEGORIES
+from src.exceptions import status_error
 
 
 API_URL = 'https://www.caetrm.com/api/v1'
 
+# download chunk size in bytes
+CHUNK_SIZE = 1024 ** 2
+
+_T = TypeVar('_T')
+
 
 def extract_id(_url: str) -> str | None:
     URL_RE = re.compile(f'{API_URL}/measures/([a-zA-Z0-9]+)/')
@@ -30,92 +51,194 @@ def extract_id(_url: str) -> str | None:
     return id_group
 
 
-class ETRMCache:
-    """Cache for eTRM API response data.
+def _range_validator(headers: Mapping[str, str]) -> str | None:
+    """Returns the validator of a response that can be sent in an
+    `If-Range` header, or `None` if it has none.
+
+    Weak ETags cannot be used for range requests.
+    """
+
+    etag = headers.get('ETag', None)
+    if etag != None and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified', None)
+
+
+def _read_body(response: requests.Response) -> bytes:
+    """Receives the body of the streamed `response`.
 
-    Decreases time required for repeat API calls for the same data.
+    Errors:
+        `ConnectionError` - connection lost while receiving the body
+    """
+
+    try:
+        return response.content
+    except (requests.exceptions.RequestException,
+            urllib3.exceptions.HTTPError) as err:
+        raise ConnectionError from err
+
+
+class SingleFlight:
+    """Thread-safe request coalescer.
+
+    Concurrent calls for the same key wait on the first (in-flight) call
+    and share its result or exception rather than repeating the call.
+
+    `calls` counts all calls, `coalesced` counts the calls that shared
+    the result of an in-flight call.
     """
 
     def __init__(self):
-        self.id_cache: list[str] = []
-        self.__id_count: int = -1
-        self.uc_id_caches: dict[str, list[str]] = {}
-        self.__uc_id_counts: dict[str, int] = {}
-        self.version_cache: dict[str, list[str]] = {}
-        self.measure_cache: dict[str, Measure] = {}
-
-    def get_ids(self,
-                offset: int,
-                limit: int,
-                use_category: str | None=None
-               ) -> tuple[list[str], int] | None:
-        if use_category != None:
-            try:
-                id_cache = self.uc_id_caches[use_category]
-                count = self.__uc_id_counts[use_category]
-            except KeyError:
-                return None
-        else:
-            id_cache = self.id_cache
-            count = self.__id_count
+        self.calls = 0
+        self.coalesced = 0
+        self.__flights: dict[Hashable, Future] = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        with self.__lock:
+            return len(self.__flights)
+
+    def do(self,
+           key: Hashable,
+           func: Callable[..., _T],
+           *args: Any
+          ) -> _T:
+        """Returns the result of `func(*args)`, or of the in-flight call
+        for `key` if one exists.
+        """
 
-        try:
-            cached_ids = id_cache[offset:offset + limit]
-            if cached_ids != [] and all(cached_ids):
-                return (cached_ids, count)
-        except IndexError:
-            return None
-        return None
+        with self.__lock:
+            self.calls += 1
+            flight = self.__flights.get(key, None)
+            if flight != None:
+                self.coalesced += 1
+                is_leader = False
+            else:
+                flight = Future()
+                self.__flights[key] = flight
+                is_leader = True
 
-    def add_ids(self,
-                measure_ids: list[str],
-                offset: int,
-                limit: int,
-                count: int,
-                use_category: str | None=None):
-        if use_category != None:
-            try:
-                id_cache = self.uc_id_caches[use_category]
-            except KeyError:
-                self.uc_id_caches[use_category] = []
-                id_cache = self.uc_id_caches[use_category]
-            self.__uc_id_counts[use_category] = count
+        if not is_leader:
+            return flight.result()
+
+        try:
+            result = func(*args)
+        except BaseException as err:
+            flight.set_exception(err)
+            raise
         else:
-            id_cache = self.id_cache
-            self.__id_count = count
+            flight.set_result(result)
+            return result
+        finally:
+            with self.__lock:
+                del self.__flights[key]
 
-        cache_len = len(id_cache)
-        if offset == cache_len:
-            id_cache.extend(measure_ids)
-        elif offset > cache_len:
-            id_cache.extend([''] * (offset - cache_len))
-            id_cache.extend(measure_ids)
-        elif offset + limit > cache_len:
-            new_ids = measure_ids[cache_len - offset:limit]
-            for i in range(offset, cache_len):
-                if id_cache[i] == '':
-                    id_cache[i] = measure_ids[i - offset]
-            id_cache.extend(new_ids)
 
-    def get_versions(self, measure_id: str) -> list[str] | None:
-        return self.version_cache.get(measure_id, None)
+class ETRMConnection:
+    """eTRM API connection layer.
 
-    def add_versions(self, measure_id: str, versions: list[str]):
-        self.version_cache[measure_id] = versions
+    Connections can share an `ETRMCache` through `cache`.
 
-    def get_measure(self, version_id: str) -> Measure | None:
-        return self.measure_cache.get(version_id, None)
+    All requests are sent through a single keep-alive session so that
+    repeat calls reuse pooled connections instead of performing a new
+    TCP/TLS handshake per request.
 
-    def add_measure(self, measure: Measure):
-        self.measure_cache[measure.full_version_id] = measure
+    Concurrent requests for the same data are coalesced into a single
+    request through `single_flight`, which also counts how many requests
+    were coalesced.
 
+    Pool configuration:
+        `pool_size` - number of per-host connection pools to keep
 
-class ETRMConnection:
-    """eTRM API connection layer."""
+        `max_host_connections` - max connections kept alive per host
+
+        `timeout` - connect and read timeout (in seconds) of each request
+
+        `max_retries` - number of retries for failed connection attempts
 
-    def __init__(self, auth_token: str):
+        `max_workers` - max number of concurrent requests made by batch
+        methods (should not exceed `max_host_connections`)
+
+    Cache configuration (approximate in-memory sizes in bytes, `None`
+    is unbounded). Limits that are not given are left as configured by
+    the owner of `cache`, or at the `ETRMCache` defaults:
+        `max_measure_cache_size` - size limit of cached measures
+
+        `max_version_cache_size` - size limit of cached version lists
+
+        `max_id_cache_size` - size limit of cached measure IDs
+
+        `max_reference_cache_size` - size limit of cached references
+    """
+
+    def __init__(self,
+                 auth_token: str,
+                 cache: ETRMCache | None=None,
+                 pool_size: int=4,
+                 max_host_connections: int=16,
+                 timeout: float | tuple[float, float]=(10, 60),
+                 max_retries: int=3,
+                 max_workers: int=8,
+                 max_measure_cache_size: int | None=UNCHANGED,
+                 max_version_cache_size: int | None=UNCHANGED,
+                 max_id_cache_size: int | None=UNCHANGED,
+                 max_reference_cache_size: int | None=UNCHANGED):
         self.auth_token = auth_token
-        self.cache = ETRMCache()
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.cache = cache or ETRMCache()
+        self.single_flight = SingleFlight()
+        self.cache.resize(max_measure_size=max_measure_cache_size,
+                          max_version_size=max_version_cache_size,
+                          max_id_size=max_id_cache_size,
+                          max_reference_size=max_reference_cache_size)
+        self.session = requests.Session()
+        self.session.headers.update({'Authorization': auth_token})
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=max_host_connections,
+                              max_retries=max_retries)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def __enter__(self) -> ETRMConnection:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Closes all pooled connections."""
+
+        self.session.close()
+
+    def __get(self,
+              url: str,
+              params: dict[str, str] | None=None,
+              headers: dict[str, str] | None=None,
+              stream: bool=False
+             ) -> requests.Response:
+        try:
+            return self.session.get(url,
+                                    params=params,
+                                    headers=headers,
+                                    stream=stream,
+                                    timeout=self.timeout)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout) as err:
+            raise ConnectionError from err
+
+    def __raise_for_status(self,
+                           status_code: int,
+                           not_found: str,
+                           server_error: str):
+        error = status_error(status_code,
+                             not_found=not_found,
+                             server_error=server_error,
+                             unauthorized=('Unauthorized token:'
+                                           f' {self.auth_token}'))
+        if error != None:
+            raise error
 
     def get_measure(self, full_version_id: str) -> Measure:
         """Returns a detailed measure object.
@@ -132,34 +255,70 @@ class ETRMConnection:
         if cached_measure != None:
             return cached_measure
 
-        statewide_id, version_id = full_version_id.split('-', 1)
-        headers = {
-            'Authorization': self.auth_token
-        }
+        return self.single_flight.do((MEASURE, full_version_id),
+                                     self.__fetch_measure,
+                                     full_version_id)
 
-        url = f'{API_URL}/measures/{statewide_id}/{version_id}'
-        try:
-            response = requests.get(url,
-                                    headers=headers,
-                                    stream=True)
-        except requests.exceptions.ConnectionError as err:
-            raise ConnectionError from err
+    def __fetch_measure(self, full_version_id: str) -> Measure:
+        cached_measure = self.cache.get_measure(full_version_id)
+        if cached_measure != None:
+            return cached_measure
 
-        if response.status_code == 404:
-            raise NotFoundError(f'Measure {full_version_id} could not be'
-                                ' found')
+        statewide_id, version_id = full_version_id.split('-', 1)
+        url = f'{API_URL}/measures/{statewide_id}/{version_id}'
+        response = self.__get(url, stream=True)
 
-        if response.status_code == 500:
-            raise ETRMResponseError('Server error occurred when retrieving'
+        self.__raise_for_status(response.status_code,
+                                f'Measure {full_version_id} could not be'
+                                    ' found',
+                                'Server error occurred when retrieving'
                                     f' measure {full_version_id}')
 
-        if response.status_code != 200:
-            raise UnauthorizedError(f'Unauthorized token: {self.auth_token}')
-
-        measure = Measure(response.json())
+        body = _read_body(response)
+        measure = Measure(decoding.loads(body), len(body))
         self.cache.add_measure(measure)
         return measure
 
+    def get_measures(self,
+                     full_version_ids: list[str]
+                    ) -> list[Measure | Exception]:
+        """Returns a list of detailed measure objects in the same order
+        as `full_version_ids`.
+
+        Uncached measures are retrieved concurrently. Errors do not abort
+        the batch, any error raised while retrieving a measure is returned
+        in place of that measure.
+        """
+
+        results: list[Measure | Exception | None] = [
+            self.cache.get_measure(version_id)
+                for version_id
+                in full_version_ids]
+        missing = {version_id
+                    for version_id, result
+                    in zip(full_version_ids, results)
+                    if result is None}
+        if missing == set():
+            return results
+
+        workers = min(self.max_workers, len(missing))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures: dict[str, Future[Measure]] = {
+                version_id: executor.submit(self.get_measure, version_id)
+                    for version_id
+                    in missing}
+
+        for i, version_id in enumerate(full_version_ids):
+            future = futures.get(version_id, None)
+            if future is None:
+                continue
+
+            try:
+                results[i] = future.result()
+            except Exception as err:
+                results[i] = err
+        return results
+
     def get_measure_ids(self,
                         offset: int=0,
                         limit: int=25,
@@ -167,6 +326,10 @@ class ETRMConnection:
                        ) -> tuple[list[str], int]:
         """Returns a list of measure ids.
 
+        Only the parts of the window that are not already cached are
+        retrieved. Expired cached pages are revalidated with a conditional
+        request.
+
         Errors:
             `NotFoundError` - (404) measure not found
 
@@ -179,6 +342,102 @@ class ETRMConnection:
         if cache_response != None:
             return cache_response
 
+        missing = self.cache.missing_ids(offset, limit, use_category)
+        for page_offset, page_limit in missing:
+            self.__get_id_page(page_offset, page_limit, use_category)
+
+        cache_response = self.cache.get_ids(offset, limit, use_category)
+        if cache_response != None:
+            return cache_response
+
+        return self.__get_id_page(offset, limit, use_category)
+
+    def get_all_measure_ids(self,
+                            use_category: str | None=None,
+                            page_size: int=100
+                           ) -> list[str]:
+        """Returns every measure ID of `use_category` (or of all measures
+        if no use category is provided) in catalog order.
+
+        See `get_catalog()` for details.
+        """
+
+        return self.get_catalog([use_category], page_size)[use_category]
+
+    def get_catalog(self,
+                    use_categories: list[str | None] | None=None,
+                    page_size: int=100
+                   ) -> dict[str | None, list[str]]:
+        """Returns every measure ID of each use category in
+        `use_categories`, in catalog order. The IDs of all measures are
+        mapped to `None`.
+
+        Crawls the measure IDs of all use categories (and all measures)
+        by default.
+
+        The first page of each use category provides its total count,
+        all remaining pages of `page_size` IDs are then retrieved
+        concurrently. All retrieved IDs are added to the ID cache, so
+        later paging is answered locally.
+
+        Errors:
+            `NotFoundError` - (404) measure not found
+
+            `ETRMResponseError` - (500) server error
+
+            `UnauthorizedError` - (!200) any other error
+        """
+
+        if use_categories is None:
+            use_categories = [None, *USE_CATEGORIES.keys()]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            first_pages = {
+                use_category: executor.submit(self.get_measure_ids,
+                                              0,
+                                              page_size,
+                                              use_category)
+                    for use_category
+                    in use_categories}
+            counts: dict[str | None, int] = {}
+            pages: list[Future[tuple[list[str], int]]] = []
+            for use_category, first_page in first_pages.items():
+                _, count = first_page.result()
+                counts[use_category] = count
+                for offset in range(page_size, count, page_size):
+                    pages.append(executor.submit(self.get_measure_ids,
+                                                 offset,
+                                                 page_size,
+                                                 use_category))
+            for page in pages:
+                page.result()
+
+        catalog: dict[str | None, list[str]] = {}
+        for use_category, count in counts.items():
+            measure_ids, _ = self.get_measure_ids(0, count, use_category)
+            catalog[use_category] = measure_ids
+        return catalog
+
+    def __get_id_page(self,
+                      offset: int,
+                      limit: int,
+                      use_category: str | None=None
+                     ) -> tuple[list[str], int]:
+        return self.single_flight.do((IDS, use_category, offset, limit),
+                                     self.__fetch_id_page,
+                                     offset,
+                                     limit,
+                                     use_category)
+
+    def __fetch_id_page(self,
+                        offset: int,
+                        limit: int,
+                        use_category: str | None=None
+                       ) -> tuple[list[str], int]:
+        cache_response = self.cache.get_ids(offset, limit, use_category)
+        if cache_response != None:
+            return cache_response
+
         params = {
             'offset': str(offset),
             'limit': str(limit)
@@ -187,28 +446,26 @@ class ETRMConnection:
         if use_category != None:
             params['use_category'] = use_category
 
-        headers = {
-            'Authorization': self.auth_token
-        }
-
-        try:
-            response = requests.get(f'{API_URL}/measures',
-                                    params=params,
-                                    headers=headers)
-        except requests.exceptions.ConnectionError as err:
-            raise ConnectionError from err
-
-        if response.status_code == 404:
-            raise NotFoundError(f'Measures could not be found')
-
-        if response.status_code == 500:
-            raise ETRMResponseError('Server error occurred when retrieving'
+        stale_page = self.cache.get_stale_ids(offset, limit, use_category)
+        headers = None if stale_page is None else stale_page[2].headers
+        response = self.__get(f'{API_URL}/measures',
+                              params=params,
+                              headers=headers)
+        if response.status_code == 304 and stale_page != None:
+            measure_ids, count, _ = stale_page
+            self.cache.refresh_ids(measure_ids=measure_ids,
+                                   offset=offset,
+                                   limit=limit,
+                                   count=count,
+                                   use_category=use_category)
+            return (measure_ids, count)
+
+        self.__raise_for_status(response.status_code,
+                                'Measures could not be found',
+                                'Server error occurred when retrieving'
                                     ' measures')
 
-        if response.status_code != 200:
-            raise UnauthorizedError(f'Unauthorized token: {self.auth_token}')
-
-        response_body = MeasuresResponse(response.json())
+        response_body = MeasuresResponse(decoding.loads(response.content))
         measure_ids = list(map(lambda result: extract_id(result.url),
                                response_body.results))
         count = response_body.count
@@ -216,13 +473,17 @@ class ETRMConnection:
                            offset=offset,
                            limit=limit,
                            count=count,
-                           use_category=use_category)
+                           use_category=use_category,
+                           validators=Validators.from_headers(
+                               response.headers))
         return (measure_ids, count)
 
     def get_measure_versions(self, measure_id: str) -> list[str]:
         """Returns a list of versions of the measure with the ID
         `measure_id`.
 
+        Expired cached versions are revalidated with a conditional request.
+
         Errors:
             `NotFoundError` - (404) measure not found
 
@@ -232,35 +493,42 @@ class ETRMConnection:
         """
 
         cached_versions = self.cache.get_versions(measure_id)
-        if cached_versions != None:
-            return list(reversed(cached_versions))
+        if cached_versions is None:
+            cached_versions = self.single_flight.do((VERSIONS, measure_id),
+                                                    self.__fetch_versions,
+                                                    measure_id)
+        return list(reversed(cached_versions))
 
-        headers = {
-            'Authorization': self.auth_token
-        }
+    def __fetch_versions(self, measure_id: str) -> list[str]:
+        cached_versions = self.cache.get_versions(measure_id)
+        if cached_versions != None:
+            return cached_versions
 
+        stale_versions = self.cache.get_stale_versions(measure_id)
+        headers = None if stale_versions is None else stale_versions[1].headers
         url = f'{API_URL}/measures/{measure_id}/'
-        try:
-            response = requests.get(url, headers=headers)
-        except requests.exceptions.ConnectionError as err:
-            raise ConnectionError from err
-
-        if response.status_code == 404:
-            raise NotFoundError(f'No versions for measure {measure_id}'
-                                ' were found')
-
-        if response.status_code == 500:
-            raise ETRMResponseError('Server error occurred while retrieving'
+        response = self.__get(url, headers=headers)
+        if response.status_code == 304 and stale_versions != None:
+            measure_versions = stale_versions[0]
+            self.cache.refresh_versions(measure_id, measure_versions)
+            return measure_versions
+
+        self.__raise_for_status(response.status_code,
+                                f'No versions for measure {measure_id}'
+                                    ' were found',
+                                'Server error occurred while retrieving'
                                     f' versions for measure {measure_id}')
 
-        if response.status_code != 200:
-            raise UnauthorizedError(f'Unauthorized token: {self.auth_token}')
-
-        response_body = MeasureVersionsResponse(response.json())
+        response_json = decoding.loads(response.content)
+        response_body = MeasureVersionsResponse(response_json)
         measure_versions = sorted(map(lambda result: result.version,
                                       response_body.versions))
-        self.cache.add_versions(measure_id, measure_versions)
-        return list(reversed(measure_versions))
+        date_committed = max(map(lambda result: result.date_committed,
+                                 response_body.versions),
+                             default=None)
+        validators = Validators.from_headers(response.headers, date_committed)
+        self.cache.add_versions(measure_id, measure_versions, validators)
+        return measure_versions
 
     def get_reference(self, reference: str) -> Reference:
         """Returns the reference associated with `reference`
@@ -273,25 +541,247 @@ class ETRMConnection:
             `UnauthorizedError` - (!200) any other error
         """
 
-        headers = {
-            'Authorization': self.auth_token
-        }
+        cached_reference = self.cache.get_reference(reference)
+        if cached_reference != None:
+            return cached_reference
 
-        url = f'{API_URL}/references/{reference}/'
-        try:
-            response = requests.get(url, headers=headers)
-        except requests.exceptions.ConnectionError as err:
-            raise ConnectionError from err
+        return self.single_flight.do((REFERENCE, reference),
+                                     self.__fetch_reference,
+                                     reference)
+
+    def __fetch_reference(self, reference: str) -> Reference:
+        cached_reference = self.cache.get_reference(reference)
+        if cached_reference != None:
+            return cached_reference
 
-        if response.status_code == 404:
-            raise NotFoundError(f'No reference with the id {reference}'
-                                ' was found')
+        url = f'{API_URL}/references/{reference}/'
+        response = self.__get(url)
 
-        if response.status_code == 500:
-            raise ETRMResponseError('Server error occurred while retrieving'
+        self.__raise_for_status(response.status_code,
+                                f'No reference with the id {reference}'
+                                    ' was found',
+                                'Server error occurred while retrieving'
                                     f' reference {reference}')
 
-        if response.status_code != 200:
-            raise UnauthorizedError(f'Unauthorized token: {self.auth_token}')
+        response_reference = Reference(decoding.loads(response.content))
+        self.cache.add_reference(response_reference)
+        return response_reference
+
+    def get_references(self,
+                       references: list[str]
+                      ) -> list[Reference | Exception]:
+        """Returns a list of references in the same order as
+        `references`.
+
+        Uncached references are retrieved concurrently. Errors do not
+        abort the batch, any error raised while retrieving a reference is
+        returned in place of that reference.
+        """
+
+        results: list[Reference | Exception | None] = [
+            self.cache.get_reference(reference)
+                for reference
+                in references]
+        missing = {reference
+                    for reference, result
+                    in zip(references, results)
+                    if result is None}
+        if missing == set():
+            return results
+
+        workers = min(self.max_workers, len(missing))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures: dict[str, Future[Reference]] = {
+                reference: executor.submit(self.get_reference, reference)
+                    for reference
+                    in missing}
+
+        for i, reference in enumerate(references):
+            future = futures.get(reference, None)
+            if future is None:
+                continue
+
+            try:
+                results[i] = future.result()
+            except Exception as err:
+                results[i] = err
+        return results
+
+    def prefetch_references(self, references: list[str]):
+        """Concurrently retrieves and caches all uncached references in
+        `references`.
+
+        Errors are ignored, they are raised once the reference is
+        requested with `get_reference()`.
+        """
+
+        self.get_references(references)
+
+    def download(self,
+                 url: str,
+                 path: str,
+                 chunk_size: int=CHUNK_SIZE) -> str:
+        """Streams the file at `url` to `path`, `chunk_size` bytes at a
+        time, and returns `path`.
+
+        The file is written to `path + '.part'` until complete. If a
+        partial file exists, the download resumes from its end with a
+        range request. The partial file is discarded if the server
+        ignores the range or the file changed since the partial download
+        (per its ETag or Last-Modified validator).
+
+        Errors:
+            `ConnectionError` - connection lost, the download can be
+            resumed by calling this method again
+
+            `NotFoundError` - (404) file not found
+
+            `ETRMResponseError` - (500) server error
+
+            `UnauthorizedError` - (!200) any other error
+        """
+
+        part_path = f'{path}.part'
+        validator_path = f'{part_path}.validator'
+        headers = {'Accept-Encoding': 'identity'}
+        offset = 0
+        validator = None
+        if os.path.exists(part_path) and os.path.exists(validator_path):
+            offset = os.path.getsize(part_path)
+            with open(validator_path, 'r') as validator_file:
+                validator = validator_file.read()
+        if offset > 0 and validator:
+            headers['Range'] = f'bytes={offset}-'
+            headers['If-Range'] = validator
+
+        response = self.__get(url, headers=headers, stream=True)
+        with response:
+            if response.status_code == 416:
+                # the partial file is no longer a prefix of the file
+                for stale_path in (part_path, validator_path):
+                    if os.path.exists(stale_path):
+                        os.remove(stale_path)
+                return self.download(url, path, chunk_size)
+
+            self.__raise_for_status(response.status_code,
+                                    f'No file was found at {url}',
+                                    'Server error occurred while'
+                                        f' downloading {url}')
+
+            if response.status_code == 206:
+                mode = 'ab'
+            else:
+                mode = 'wb'
+                validator = _range_validator(response.headers)
+                if validator != None:
+                    with open(validator_path, 'w') as validator_file:
+                        validator_file.write(validator)
+                elif os.path.exists(validator_path):
+                    os.remove(validator_path)
+
+            try:
+                with open(part_path, mode) as part_file:
+                    for chunk in response.iter_content(chunk_size):
+                        part_file.write(chunk)
+            except (requests.exceptions.RequestException,
+                    urllib3.exceptions.HTTPError) as err:
+                raise ConnectionError from err
+
+        os.replace(part_path, path)
+        if os.path.exists(validator_path):
+            os.remove(validator_path)
+        return path
+
+    def iter_export_rows(self, url: str) -> Iterator[dict[str, Any]]:
+        """Streams the rows of the CSV or JSON export at `url`.
+
+        CSV exports are parsed as they are received. JSON exports are
+        parsed one page at a time, following the `next` link of each
+        page. Only the current chunk or page is held in memory.
+
+        Errors:
+            `ConnectionError` - connection lost
+
+            `NotFoundError` - (404) export not found
+
+            `ETRMResponseError` - (500) server error
+
+            `UnauthorizedError` - (!200) any other error
+        """
+
+        next_url: str | None = url
+        while next_url != None:
+            response = self.__get(next_url, stream=True)
+            with response:
+                self.__raise_for_status(response.status_code,
+                                        f'No export was found at {next_url}',
+                                        'Server error occurred while'
+                                            f' retrieving {next_url}')
+
+                next_url = None
+                content_type = response.headers.get('Content-Type', '')
+                try:
+                    if 'json' not in content_type:
+                        # keep the stream open at EOF so that the text
+                        # wrapper can detect the end of the file
+                        response.raw.decode_content = True
+                        response.raw.auto_close = False
+                        text = io.TextIOWrapper(
+                            response.raw,
+                            encoding=response.encoding or 'utf-8',
+                            newline='')
+                        yield from csv.DictReader(text)
+                        continue
+
+                    page = decoding.loads(response.content)
+                except (requests.exceptions.RequestException,
+                        urllib3.exceptions.HTTPError) as err:
+                    raise ConnectionError from err
+
+            if isinstance(page, list):
+                yield from page
+            else:
+                yield from page.get('results', [])
+                next_url = page.get('next', None)
+
+    def download_permutations(self,
+                              measure: Measure,
+                              path: str,
+                              chunk_size: int=CHUNK_SIZE) -> str:
+        """Downloads the permutations export of `measure` to `path`.
+
+        See `download()`.
+        """
+
+        return self.download(measure.permutations_url, path, chunk_size)
+
+    def download_property_data(self,
+                               measure: Measure,
+                               path: str,
+                               chunk_size: int=CHUNK_SIZE) -> str:
+        """Downloads the property data export of `measure` to `path`.
+
+        See `download()`.
+        """
+
+        return self.download(measure.property_data_url, path, chunk_size)
+
+    def iter_permutation_rows(self,
+                              measure: Measure
+                             ) -> Iterator[dict[str, Any]]:
+        """Streams the rows of the permutations export of `measure`.
+
+        See `iter_export_rows()`.
+        """
+
+        return self.iter_export_rows(measure.permutations_url)
+
+    def iter_property_data_rows(self,
+                                measure: Measure
+                               ) -> Iterator[dict[str, Any]]:
+        """Streams the rows of the property data export of `measure`.
+
+        See `iter_export_rows()`.
+        """
 
-        return Reference(response.json())
+        return self.iter_export_rows(measure.property_data_url)
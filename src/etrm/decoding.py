@@ -0,0 +1,64 @@
+from __future__ import annotations
+import json
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# names of the available JSON decoders, the first is the default
+DECODERS: dict[str, Callable[[bytes | str], Any]] = {}
+if orjson != None:
+    DECODERS['orjson'] = orjson.loads
+DECODERS['json'] = json.loads
+
+_decoder_name = next(iter(DECODERS))
+_decoder = DECODERS[_decoder_name]
+
+
+def set_decoder(name: str | None=None):
+    """Sets the JSON decoder used by `loads()` to the decoder named
+    `name`, or to the default decoder if `name` is `None`.
+
+    Errors:
+        `ValueError` - the decoder is not installed
+    """
+
+    global _decoder, _decoder_name
+
+    if name is None:
+        name = next(iter(DECODERS))
+
+    decoder = DECODERS.get(name, None)
+    if decoder is None:
+        raise ValueError(f'JSON decoder {name} is not installed')
+
+    _decoder = decoder
+    _decoder_name = name
+
+
+def get_decoder() -> str:
+    """Returns the name of the JSON decoder used by `loads()`."""
+
+    return _decoder_name
+
+
+def loads(data: bytes | str) -> Any:
+    """Decodes the JSON document `data` with the current decoder.
+
+    Errors:
+        `json.JSONDecodeError` - `data` is not a valid JSON document
+    """
+
+    return _decoder(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encodes `obj` as a UTF-8 JSON document."""
+
+    if orjson != None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode()
+
@@ -1,157 +1,501 @@
+import sys
+import threading
 import unicodedata
-from typing import Any
+import numpy as np
+import numpy.typing as npt
+from functools import cached_property
+from typing import Any, Callable, Iterator, Mapping, TypeVar
 
+from src.etrm.columnar import ColumnarValues, TableRow, ExclusionIndex
+from src.etrm.permutations import PermutationSpace
 from src.exceptions import ETRMResponseError
-from src.utils import getc
+from src.utils import compile_decoder, compile_getc, istr
 
 
 ETRM_URL = 'https://www.caetrm.com'
 
+# approximate in-memory size of decoded JSON per byte of its encoding
+JSON_SIZE_FACTOR = 7
+
+_T = TypeVar('_T')
+
+
+def approx_size(obj: Any) -> int:
+    """Returns the approximate in-memory size (in bytes) of the JSON-like
+    object `obj`.
+    """
+
+    if isinstance(obj, str):
+        return 49 + len(obj)
+
+    if isinstance(obj, dict):
+        return 64 + sum(approx_size(key) + approx_size(value)
+                        for key, value
+                        in obj.items())
+
+    if isinstance(obj, (list, tuple)):
+        return 56 + 8 * len(obj) + sum(map(approx_size, obj))
+
+    return 28
+
+
+def _decoded_size(obj: Any) -> int:
+    """Returns the approximate in-memory size (in bytes) of the decoded
+    object `obj` and the objects in its slots.
+
+    Strings and dicts are not counted, as they are interned (see
+    `istr()`) or shared with the response JSON.
+    """
+
+    if obj is None or isinstance(obj, (str, dict)):
+        return 0
+
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(map(_decoded_size, obj))
+
+    size = sys.getsizeof(obj)
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if name.startswith('__'):
+                name = f'_{cls.__name__}{name}'
+            size += _decoded_size(getattr(obj, name, None))
+    return size
+
 
 class MeasureInfo:
+    __slots__ = ('name', 'url')
+
+    __decode = compile_decoder({
+        'name': str,
+        'url': str
+    })
+
     def __init__(self, res_json: dict[str, Any]):
         try:
-            self.name = getc(res_json, 'name', str)
-            self.url = getc(res_json, 'url', str)
+            self.__decode(res_json)
         except IndexError:
             raise ETRMResponseError()
 
 
 class MeasuresResponse:
+    __slots__ = ('count', 'next', 'previous', 'results')
+
+    __decode = compile_decoder({
+        'count': int,
+        'next': str,
+        'previous': str,
+        'results': list[MeasureInfo]
+    })
+
     def __init__(self, res_json: dict[str, Any]):
         try:
-            self.count = getc(res_json, 'count', int)
-            self.next = getc(res_json, 'next', str)
-            self.previous = getc(res_json, 'previous', str)
-            self.results = getc(res_json, 'results', list[MeasureInfo])
+            self.__decode(res_json)
         except IndexError:
             raise ETRMResponseError()
 
 
 class MeasureVersionInfo:
+    __slots__ = ('version',
+                 'status',
+                 'change_description',
+                 'owner',
+                 'is_published',
+                 'date_committed',
+                 'url')
+
+    __decode = compile_decoder({
+        'version': str,
+        'status': istr,
+        'change_description': str,
+        'owner': str,
+        'is_published': str,
+        'date_committed': str,
+        'url': str
+    })
+
     def __init__(self, res_json: dict[str, Any]):
         try:
-            self.version = getc(res_json, 'version', str)
-            self.status = getc(res_json, 'status', str)
-            self.change_description = getc(res_json, 'change_description', str)
-            self.owner = getc(res_json, 'owner', str)
-            self.is_published = getc(res_json, 'is_published', str)
-            self.date_committed = getc(res_json, 'date_committed', str)
-            self.url = getc(res_json, 'url', str)
+            self.__decode(res_json)
         except IndexError:
             raise ETRMResponseError('malformed measure version info')
 
 
 class MeasureVersionsResponse:
+    __slots__ = ('statewide_measure_id', 'use_category', 'versions')
+
+    __decode = compile_decoder({
+        'statewide_measure_id': str,
+        'use_category': istr,
+        'versions': list[MeasureVersionInfo]
+    })
+
     def __init__(self, res_json: dict[str, Any]):
         try:
-            self.statewide_measure_id = getc(res_json, 'statewide_measure_id', str)
-            self.use_category = getc(res_json, 'use_category', str)
-            self.versions = getc(res_json, 'versions', list[MeasureVersionInfo])
+            self.__decode(res_json)
         except IndexError:
             raise ETRMResponseError('malformed measure versions response')
 
 
 class Label:
+    __slots__ = ('name', 'api_name', 'active', 'description')
+
+    __decode = compile_decoder({
+        'name': istr,
+        'api_name': istr,
+        'active': istr,
+        'description': str
+    })
+
     def __init__(self, res_json: dict[str, Any]):
         try:
-            self.name = getc(res_json, 'name', str)
-            self.api_name = getc(res_json, 'api_name', str)
-            self.active = getc(res_json, 'active', str)
-            self.description = getc(res_json, 'description', str)
+            self.__decode(res_json)
         except IndexError:
             raise ETRMResponseError()
 
+    @property
+    def is_active(self) -> bool:
+        return self.active.strip().lower() not in ('no', 'n', 'false', '0')
+
 
 class Determinant:
+    __slots__ = ('name',
+                 'api_name',
+                 'labels',
+                 'description',
+                 'order',
+                 'reference_refs')
+
+    __decode = compile_decoder({
+        'name': istr,
+        'api_name': istr,
+        'labels': list[Label],
+        'description': str,
+        'order': int,
+        'reference_refs': list[istr]
+    })
+
     def __init__(self, res_json: dict[str, Any]):
         try:
-            self.name = getc(res_json, 'name', str)
-            self.api_name = getc(res_json, 'api_name', str)
-            self.labels = getc(res_json, 'labels', list[Label])
-            self.description = getc(res_json, 'description', str)
-            self.order = getc(res_json, 'order', int)
-            self.reference_refs = getc(res_json, 'reference_refs', list[str])
+            self.__decode(res_json)
         except IndexError:
             raise ETRMResponseError()
 
 
 class SharedDeterminant:
+    __slots__ = ('order', 'version', 'active_labels', 'url')
+
+    __decode = compile_decoder({
+        'order': int,
+        'version': dict[str, str],
+        'active_labels': list[istr],
+        'url': str
+    })
+
     def __init__(self, res_json: dict[str, Any]):
         try:
-            self.order = getc(res_json, 'order', int)
-            self.version = getc(res_json, 'version', dict[str, str])['version_string']
-            self.active_labels = getc(res_json, 'active_labels', list[str])
-            self.url = getc(res_json, 'url', str)
+            self.__decode(res_json)
+            self.version = self.version['version_string']
         except IndexError:
             raise ETRMResponseError()
 
 
 class SharedValueTable:
+    __slots__ = ('order', 'version', 'url')
+
+    __decode = compile_decoder({
+        'order': int,
+        'version': dict[str, str],
+        'url': str
+    })
+
     def __init__(self, res_json: dict[str, Any]):
         try:
-            self.order = getc(res_json, 'order', int)
-            self.version = getc(res_json, 'version', dict[str, str])['version_string']
-            self.url = getc(res_json, 'url', str)
+            self.__decode(res_json)
+            self.version = self.version['version_string']
         except IndexError:
             raise ETRMResponseError()
 
 
 class Column:
+    __slots__ = ('name', 'api_name', 'unit', 'reference_refs')
+
+    __decode = compile_decoder({
+        'name': istr,
+        'api_name': istr,
+        'unit': istr,
+        'reference_refs': list[istr]
+    })
+
     def __init__(self, res_json: dict[str, Any]):
         try:
-            self.name = getc(res_json, 'name', str)
-            self.api_name = getc(res_json, 'api_name', str)
-            self.unit = getc(res_json, 'unit', str)
-            self.reference_refs = getc(res_json, 'reference_refs', list[str])
+            self.__decode(res_json)
         except IndexError:
             raise ETRMResponseError()
 
 
 class ValueTable:
+    __slots__ = ('name',
+                 'api_name',
+                 'type',
+                 'description',
+                 'order',
+                 'determinants',
+                 'columns',
+                 'reference_refs',
+                 'on_resize',
+                 '__json',
+                 '__data',
+                 '__lock')
+
+    __decode = compile_decoder({
+        'name': istr,
+        'api_name': istr,
+        'type': istr,
+        'description': str,
+        'order': int,
+        'determinants': list[istr],
+        'columns': list[Column],
+        'reference_refs': list[istr]
+    })
+
+    __get_values = staticmethod(
+        compile_getc('values', list[list[str | None]]))
+
     def __init__(self, res_json: dict[str, Any]):
+        self.__json = res_json
+        self.__data: ColumnarValues | None = None
+        self.__lock = threading.Lock()
+        self.on_resize: Callable[[int], None] | None = None
+        try:
+            self.__decode(res_json)
+        except IndexError:
+            raise ETRMResponseError()
+
+    @property
+    def data(self) -> ColumnarValues:
+        """Columnar values, decoded once on first access.
+
+        `on_resize` is called with the size of the structures built from
+        the values (see `ColumnarValues.nbytes`).
+        """
+
+        data = self.__data
+        if data is None:
+            with self.__lock:
+                if self.__data is None:
+                    self.__data = self.__decode_values()
+                data = self.__data
+        return data
+
+    def __decode_values(self) -> ColumnarValues:
         try:
-            self.name = getc(res_json, 'name', str)
-            self.api_name = getc(res_json, 'api_name', str)
-            self.type = getc(res_json, 'type', str)
-            self.description = getc(res_json, 'description', str)
-            self.order = getc(res_json, 'order', int)
-            self.determinants = getc(res_json, 'determinants', list[str])
-            self.columns = getc(res_json, 'columns', list[Column])
-            self.values = getc(res_json, 'values', list[list[str | None]])
-            self.reference_refs = getc(res_json, 'reference_refs', list[str])
+            rows = self.__get_values(self.__json)
         except IndexError:
             raise ETRMResponseError()
+        data = ColumnarValues(rows, len(self.determinants), self.__resized)
+        self.__resized(data.nbytes)
+        return data
+
+    @property
+    def values(self) -> list[list[str | None]]:
+        """Rows of values as strings, with null values as `None`.
+
+        Prefer `data`, which does not copy the values.
+        """
+
+        return self.data.rows()
+
+    def __resized(self, size: int):
+        if self.on_resize != None:
+            self.on_resize(size)
+
+    def lookup(self, *labels: str | None) -> TableRow | None:
+        """Returns the first row with the determinant labels `labels`
+        (in the order of `determinants`), or `None` if no row matches.
+        """
+
+        if len(labels) != len(self.determinants):
+            raise ValueError(f'expected {len(self.determinants)} labels,'
+                             f' got {len(labels)}')
+
+        return self.data.row_index.get(labels)
+
+    def scan(self, *labels: str | None) -> list[TableRow]:
+        """Returns all rows whose leading determinant labels are
+        `labels`.
+        """
+
+        return self.data.row_index.find(labels)
 
 
 class Calculation:
+    __slots__ = ('name',
+                 'api_name',
+                 'order',
+                 'unit',
+                 'determinants',
+                 'reference_refs',
+                 'on_resize',
+                 '__json',
+                 '__data',
+                 '__lock')
+
+    __decode = compile_decoder({
+        'name': istr,
+        'api_name': istr,
+        'order': int,
+        'unit': istr,
+        'determinants': list[istr],
+        'reference_refs': list[istr]
+    })
+
+    __get_values = staticmethod(compile_getc('values', list[list[str]]))
+
     def __init__(self, res_json: dict[str, Any]):
+        self.__json = res_json
+        self.__data: ColumnarValues | None = None
+        self.__lock = threading.Lock()
+        self.on_resize: Callable[[int], None] | None = None
+        try:
+            self.__decode(res_json)
+        except IndexError:
+            raise ETRMResponseError()
+
+    @property
+    def data(self) -> ColumnarValues:
+        """Columnar values, decoded once on first access.
+
+        `on_resize` is called with the size of the structures built from
+        the values (see `ColumnarValues.nbytes`).
+        """
+
+        data = self.__data
+        if data is None:
+            with self.__lock:
+                if self.__data is None:
+                    self.__data = self.__decode_values()
+                data = self.__data
+        return data
+
+    def __decode_values(self) -> ColumnarValues:
         try:
-            self.name = getc(res_json, 'name', str)
-            self.api_name = getc(res_json, 'api_name', str)
-            self.order = getc(res_json, 'order', int)
-            self.unit = getc(res_json, 'unit', str)
-            self.determinants = getc(res_json, 'determinants', list[str])
-            self.values = getc(res_json, 'values', list[list[str]])
-            self.reference_refs = getc(res_json, 'reference_refs', list[str])
+            rows = self.__get_values(self.__json)
         except IndexError:
             raise ETRMResponseError()
+        data = ColumnarValues(rows, len(self.determinants), self.__resized)
+        self.__resized(data.nbytes)
+        return data
+
+    @property
+    def values(self) -> list[list[str | None]]:
+        """Rows of values as strings, with null values as `None`.
+
+        Prefer `data`, which does not copy the values.
+        """
+
+        return self.data.rows()
+
+    def __resized(self, size: int):
+        if self.on_resize != None:
+            self.on_resize(size)
+
+    def lookup(self, *labels: str | None) -> TableRow | None:
+        """Returns the first row with the determinant labels `labels`
+        (in the order of `determinants`), or `None` if no row matches.
+        """
+
+        if len(labels) != len(self.determinants):
+            raise ValueError(f'expected {len(self.determinants)} labels,'
+                             f' got {len(labels)}')
+
+        return self.data.row_index.get(labels)
+
+    def scan(self, *labels: str | None) -> list[TableRow]:
+        """Returns all rows whose leading determinant labels are
+        `labels`.
+        """
+
+        return self.data.row_index.find(labels)
 
 
 class ExclusionTable:
+    __slots__ = ('name',
+                 'api_name',
+                 'order',
+                 'determinants',
+                 'values',
+                 'reference_refs')
+
+    __decode = compile_decoder({
+        'name': istr,
+        'api_name': istr,
+        'order': int,
+        'determinants': list[istr],
+        'values': list[tuple[str, str, bool]],
+        'reference_refs': list[istr]
+    })
+
     def __init__(self, res_json: dict[str, Any]):
         try:
-            self.name = getc(res_json, 'name', str)
-            self.api_name = getc(res_json, 'api_name', str)
-            self.order = getc(res_json, 'order', int)
-            self.determinants = getc(res_json, 'determinants', list[str])
-            self.values = getc(res_json, 'values', list[tuple[str, str, bool]])
-            self.reference_refs = getc(res_json, 'reference_refs', list[str])
+            self.__decode(res_json)
         except IndexError:
             raise ETRMResponseError()
 
 
+class Characterizations(Mapping[str, str]):
+    """Read-only mapping of characterization names to their HTML.
+
+    Characterizations are NFKD-normalized on first access.
+    """
+
+    __slots__ = ('__json', '__names', '__normalized')
+
+    def __init__(self, res_json: dict[str, Any], names: list[str]):
+        self.__json = res_json
+        self.__names = names
+        self.__normalized: dict[str, str] = {}
+
+    def __getitem__(self, name: str) -> str:
+        try:
+            return self.__normalized[name]
+        except KeyError:
+            pass
+
+        if name not in self.__names:
+            raise KeyError(name)
+
+        try:
+            uchar = self.__json[name]
+        except KeyError:
+            raise ETRMResponseError()
+
+        normalized = unicodedata.normalize('NFKD', uchar)
+        self.__normalized[name] = normalized
+        return normalized
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__names)
+
+    def __len__(self) -> int:
+        return len(self.__names)
+
+
 class Measure:
+    """eTRM measure.
+
+    Sub-objects (determinants, tables, etc.) and characterizations are
+    decoded on first access. Unlike its sub-objects, a measure is not
+    slotted, as memoized attributes are stored in its `__dict__`.
+
+    `json_size` is the approximate in-memory size (in bytes) of the
+    response JSON as received, estimated from `body_size`, the size of
+    its encoding (see `JSON_SIZE_FACTOR`). The JSON is measured directly
+    if `body_size` is not given. `decoded_size` is the approximate change
+    in size since then from the sub-objects decoded so far, along with
+    the structures built from them (e.g., table values). `on_resize` is
+    called with the measure each time the size changes.
+    """
+
     __characterization_names = [
         'technology_summary',
         'measure_case_description',
@@ -174,67 +518,309 @@ class Measure:
         'deer_differences_analysis'
     ]
 
-    def __init__(self, res_json: dict[str, Any]):
+    __decode = compile_decoder({
+        'statewide_measure_id': str,
+        'is_published': bool,
+        'name': str,
+        'use_category': istr,
+        'status': istr,
+        'effective_start_date': str,
+        'sunset_date': str | None,
+        'pa_lead': istr,
+        'permutation_method': int,
+        'workpaper_cover_sheet': str,
+        'characterization_source_file': str | None,
+        'full_version_id': str,
+        'date_committed': str,
+        'change_description': str,
+        'owner': str,
+        'permutations_url': str,
+        'property_data_url': str
+    })
+
+    __get_determinants = staticmethod(
+        compile_getc('determinants', list[Determinant]))
+    __get_shared_determinant_refs = staticmethod(
+        compile_getc('shared_determinant_refs', list[SharedDeterminant]))
+    __get_shared_lookup_refs = staticmethod(
+        compile_getc('shared_lookup_refs', list[SharedValueTable]))
+    __get_value_tables = staticmethod(
+        compile_getc('value_tables', list[ValueTable]))
+    __get_calculations = staticmethod(
+        compile_getc('calculations', list[Calculation]))
+    __get_exclusion_tables = staticmethod(
+        compile_getc('exclusion_tables', list[ExclusionTable]))
+
+    def __init__(self,
+                 res_json: dict[str, Any],
+                 body_size: int | None=None):
         self._json = res_json
+        if body_size is None:
+            self.json_size = approx_size(res_json)
+        else:
+            self.json_size = body_size * JSON_SIZE_FACTOR
+        self.decoded_size = 0
+        self.on_resize: Callable[[Measure], None] | None = None
         try:
-            self.statewide_measure_id = getc(res_json, 'statewide_measure_id', str)
-            self.is_published = getc(res_json, 'is_published', bool)
-            self.name = getc(res_json, 'name', str)
-            self.use_category = getc(res_json, 'use_category', str)
-            self.status = getc(res_json, 'status', str)
-            self.effective_start_date = getc(res_json, 'effective_start_date', str)
-            self.sunset_date = getc(res_json, 'sunset_date', str | None)
-            self.pa_lead = getc(res_json, 'pa_lead', str)
-            self.permutation_method = getc(res_json, 'permutation_method', int)
-            self.workpaper_cover_sheet = getc(res_json, 'workpaper_cover_sheet', str)
-            self.characterization_source_file = getc(res_json, 'characterization_source_file', str | None)
-            self.determinants = getc(res_json, 'determinants', list[Determinant])
-            self.shared_determinant_refs = getc(res_json, 'shared_determinant_refs', list[SharedDeterminant])
-            self.shared_lookup_refs = getc(res_json, 'shared_lookup_refs', list[SharedValueTable])
-            self.value_tables = getc(res_json, 'value_tables', list[ValueTable])
-            self.calculations = getc(res_json, 'calculations', list[Calculation])
-            self.exclusion_tables = getc(res_json, 'exclusion_tables', list[ExclusionTable])
-            self.full_version_id = getc(res_json, 'full_version_id', str)
-            self.date_committed = getc(res_json, 'date_committed', str)
-            self.change_description = getc(res_json, 'change_description', str)
-            self.owner = getc(res_json, 'owner', str)
-            self.permutations_url = getc(res_json, 'permutations_url', str)
-            self.property_data_url = getc(res_json, 'property_data_url', str)
+            self.__decode(res_json)
             id_path = '/'.join(self.full_version_id.split('-'))
             self.link = f'{ETRM_URL}/measure/{id_path}'
         except IndexError:
             raise ETRMResponseError()
 
-        self.characterizations = self.__get_characterizations()
+    def __resize(self, size: int):
+        self.decoded_size += size
+        if self.on_resize != None:
+            self.on_resize(self)
+
+    def __decoded(self, obj: _T) -> _T:
+        self.__resize(_decoded_size(obj))
+        return obj
 
-    def __get_characterizations(self) -> dict[str, str]:
-        char_list: dict[str, str] = {}
-        for char_name in self.__characterization_names:
-            try:
-                uchar = self._json[char_name]
-                char_list[char_name] = unicodedata.normalize('NFKD', uchar)
-            except KeyError:
-                raise ETRMResponseError()
+    @cached_property
+    def determinants(self) -> list[Determinant]:
+        try:
+            return self.__decoded(self.__get_determinants(self._json))
+        except IndexError:
+            raise ETRMResponseError()
 
-        return char_list
+    @cached_property
+    def shared_determinant_refs(self) -> list[SharedDeterminant]:
+        try:
+            return self.__decoded(
+                self.__get_shared_determinant_refs(self._json))
+        except IndexError:
+            raise ETRMResponseError()
 
-    def get_determinant(self, name: str) -> Determinant | None:
+    @cached_property
+    def shared_lookup_refs(self) -> list[SharedValueTable]:
+        try:
+            return self.__decoded(self.__get_shared_lookup_refs(self._json))
+        except IndexError:
+            raise ETRMResponseError()
+
+    @cached_property
+    def value_tables(self) -> list[ValueTable]:
+        try:
+            value_tables = self.__get_value_tables(self._json)
+        except IndexError:
+            raise ETRMResponseError()
+        for table in value_tables:
+            table.on_resize = self.__resize
+        return self.__decoded(value_tables)
+
+    @cached_property
+    def calculations(self) -> list[Calculation]:
+        try:
+            calculations = self.__get_calculations(self._json)
+        except IndexError:
+            raise ETRMResponseError()
+        for calculation in calculations:
+            calculation.on_resize = self.__resize
+        return self.__decoded(calculations)
+
+    @cached_property
+    def exclusion_tables(self) -> list[ExclusionTable]:
+        try:
+            return self.__decoded(self.__get_exclusion_tables(self._json))
+        except IndexError:
+            raise ETRMResponseError()
+
+    @cached_property
+    def characterizations(self) -> Characterizations:
+        return self.__decoded(
+            Characterizations(self._json, self.__characterization_names))
+
+    def get_reference_codes(self) -> list[str]:
+        """Returns the codes of all references of the determinants,
+        value tables and value table columns, without duplicates.
+        """
+
+        reference_codes: list[str] = []
+        for determinant in self.determinants:
+            reference_codes.extend(determinant.reference_refs)
+        for table in self.value_tables:
+            reference_codes.extend(table.reference_refs)
+            for column in table.columns:
+                reference_codes.extend(column.reference_refs)
+        return list(dict.fromkeys(reference_codes))
+
+    @cached_property
+    def __determinant_index(self) -> dict[str, Determinant]:
+        index: dict[str, Determinant] = {}
         for determinant in self.determinants:
-            if determinant.api_name == name or determinant.name == name:
-                return determinant
-        return None
+            index.setdefault(determinant.api_name, determinant)
+            index.setdefault(determinant.name, determinant)
+        return index
 
-    def get_shared_parameter(self, name: str) -> SharedDeterminant | None:
+    @cached_property
+    def __shared_parameter_index(self) -> dict[str, SharedDeterminant]:
+        index: dict[str, SharedDeterminant] = {}
+        for parameter in self.shared_determinant_refs:
+            index.setdefault(parameter.version.split('-')[0], parameter)
+        return index
+
+    @cached_property
+    def __value_table_indexes(self
+                             ) -> tuple[dict[str, tuple[int, ValueTable]],
+                                        dict[str, tuple[int, ValueTable]]]:
+        """Value tables (and their positions) by name and by lower case
+        API name.
+        """
+
+        by_name: dict[str, tuple[int, ValueTable]] = {}
+        by_api_name: dict[str, tuple[int, ValueTable]] = {}
+        for i, table in enumerate(self.value_tables):
+            by_name.setdefault(table.name, (i, table))
+            by_api_name.setdefault(table.api_name.lower(), (i, table))
+        return (by_name, by_api_name)
+
+    @cached_property
+    def __label_ordinals(self) -> dict[str, dict[str, int]]:
+        """Ordinals of the labels (by name and API name) of each
+        determinant, by determinant API name.
+        """
+
+        ordinals: dict[str, dict[str, int]] = {}
+        for determinant in self.determinants:
+            label_ordinals: dict[str, int] = {}
+            for i, label in enumerate(determinant.labels):
+                label_ordinals.setdefault(label.api_name, i)
+                label_ordinals.setdefault(label.name, i)
+            ordinals.setdefault(determinant.api_name, label_ordinals)
+        return ordinals
+
+    @cached_property
+    def __exclusion_indexes(self) -> dict[str, ExclusionIndex]:
+        return {}
+
+    def get_exclusion_index(self, api_name: str) -> ExclusionIndex | None:
+        """Returns the bitset index of the two determinant exclusion table
+        with the API name `api_name`, built on first use.
+        """
+
+        index = self.__exclusion_indexes.get(api_name, None)
+        if index != None:
+            return index
+
+        for table in self.exclusion_tables:
+            if table.api_name == api_name:
+                break
+        else:
+            return None
+
+        if len(table.determinants) != 2:
+            return None
+
+        ordinals = tuple(self.__label_ordinals.get(determinant, {})
+                            for determinant
+                            in table.determinants)
+        index = ExclusionIndex(table.values, ordinals)
+        self.__exclusion_indexes[api_name] = index
+        return index
+
+    def get_permutation_mask(self,
+                             permutations: Mapping[str, npt.ArrayLike]
+                            ) -> npt.NDArray[np.bool_]:
+        """Returns a mask of the allowed permutations.
+
+        `permutations` maps determinant API names to equal length arrays
+        of labels, each permutation being one position across all arrays.
+        A permutation is allowed unless an exclusion table excludes the
+        labels of two of its determinants. Exclusion tables of
+        determinants not in `permutations` are ignored.
+        """
+
+        columns = {api_name: np.asarray(labels, dtype=np.str_)
+                    for api_name, labels
+                    in permutations.items()}
+        count = max((column.size for column in columns.values()), default=0)
+        allowed = np.ones(count, dtype=np.bool_)
+        for table in self.exclusion_tables:
+            if (len(table.determinants) != 2
+                    or any(determinant not in columns
+                            for determinant
+                            in table.determinants)):
+                continue
+
+            index = self.get_exclusion_index(table.api_name)
+            labels_a, labels_b = (columns[determinant]
+                                    for determinant
+                                    in table.determinants)
+            allowed &= index.allowed_mask(labels_a, labels_b)
+        return allowed
+
+    @cached_property
+    def permutation_space(self) -> PermutationSpace:
+        """Permutation space of the active labels of all determinants and
+        shared parameters, minus the label pairs excluded by the
+        exclusion tables.
+        """
+
+        dimensions: dict[str, list[str]] = {}
+        label_api_names: dict[str, dict[str, str]] = {}
+        for determinant in self.determinants:
+            labels = dimensions.setdefault(determinant.api_name, [])
+            api_names = label_api_names.setdefault(determinant.api_name, {})
+            for label in determinant.labels:
+                api_names.setdefault(label.name, label.api_name)
+                if label.is_active:
+                    labels.append(label.api_name)
         for parameter in self.shared_determinant_refs:
-            if parameter.version.split('-')[0] == name:
-                return parameter
-        return None
+            dimensions.setdefault(parameter.version.split('-')[0],
+                                  parameter.active_labels)
+
+        exclusions: list[tuple[str, str, set[tuple[str, str]]]] = []
+        for table in self.exclusion_tables:
+            if len(table.determinants) != 2:
+                continue
+
+            api_names_a, api_names_b = (label_api_names.get(determinant, {})
+                                            for determinant
+                                            in table.determinants)
+            allowed_pairs: dict[tuple[str, str], bool] = {}
+            for label_a, label_b, allowed in table.values:
+                pair = (api_names_a.get(label_a, label_a),
+                        api_names_b.get(label_b, label_b))
+                allowed_pairs[pair] = bool(allowed)
+            excluded = {pair
+                            for pair, allowed
+                            in allowed_pairs.items()
+                            if not allowed}
+            exclusions.append((*table.determinants, excluded))
+
+        return PermutationSpace(list(dimensions.items()), exclusions)
+
+    def iter_permutations(self) -> Iterator[tuple[str, ...]]:
+        """Streams the allowed permutations of the measure, see
+        `permutation_space`.
+        """
+
+        return iter(self.permutation_space)
+
+    def count_permutations(self) -> int:
+        """Returns the exact number of allowed permutations of the
+        measure, without enumerating them.
+        """
+
+        return self.permutation_space.count()
+
+    def get_determinant(self, name: str) -> Determinant | None:
+        return self.__determinant_index.get(name, None)
+
+    def get_shared_parameter(self, name: str) -> SharedDeterminant | None:
+        return self.__shared_parameter_index.get(name, None)
 
     def get_value_table(self, name: str) -> ValueTable | None:
-        for table in self.value_tables:
-            if table.name == name or table.api_name.lower() == name.lower():
-                return table
-        return None
+        by_name, by_api_name = self.__value_table_indexes
+        matches = [match
+                    for match
+                    in (by_name.get(name, None),
+                        by_api_name.get(name.lower(), None))
+                    if match != None]
+        if matches == []:
+            return None
+        return min(matches, key=lambda match: match[0])[1]
 
     def get_table_data(self, name: str) -> list[list[str]] | None:
         table = self.get_value_table(name)
@@ -248,35 +834,42 @@ class Measure:
         for column in table.columns:
             headers.append(f'{column.name} ({column.unit})')
 
-        body: list[list[str]] = []
-        for row in table.values:
-            table_row: list[str] = []
-            for item in row:
-                if item is None:
-                    table_row.append('')
-                else:
-                    table_row.append(item)
-            body.append(table_row)
-
         data = [headers]
-        data.extend(body)
+        data.extend(table.data.rows(null=''))
         return data
 
 
 class Reference:
+    __slots__ = ('json',
+                 'reference_code',
+                 'reference_citation',
+                 'source_reference',
+                 'source_url',
+                 'reference_location',
+                 'reference_type',
+                 'publication_title',
+                 'lead_author',
+                 'lead_author_org',
+                 'sponsor_org',
+                 'source_document')
+
+    __decode = compile_decoder({
+        'reference_code': str,
+        'reference_citation': str,
+        'source_reference': str | None,
+        'source_url': str | None,
+        'reference_location': str | None,
+        'reference_type': str,
+        'publication_title': str | None,
+        'lead_author': str | None,
+        'lead_author_org': str | None,
+        'sponsor_org': str | None,
+        'source_document': str
+    })
+
     def __init__(self, res_json: dict[str, Any]):
         self.json = res_json
         try:
-            self.reference_code = getc(res_json, 'reference_code', str)
-            self.reference_citation = getc(res_json, 'reference_citation', str)
-            self.source_reference = getc(res_json, 'source_reference', str | None)
-            self.source_url = getc(res_json, 'source_url', str | None)
-            self.reference_location = getc(res_json, 'reference_location', str | None)
-            self.reference_type = getc(res_json, 'reference_type', str)
-            self.publication_title = getc(res_json, 'publication_title', str | None)
-            self.lead_author = getc(res_json, 'lead_author', str | None)
-            self.lead_author_org = getc(res_json, 'lead_author_org', str | None)
-            self.sponsor_org = getc(res_json, 'sponsor_org', str | None)
-            self.source_document = getc(res_json, 'source_document', str)
+            self.__decode(res_json)
         except IndexError:
             raise ETRMResponseError()
@@ -0,0 +1,174 @@
+from __future__ import annotations
+import math
+from collections import defaultdict
+from typing import Iterator
+
+
+class PermutationSpace:
+    """Permutation space of a measure.
+
+    The space is the cartesian product of the labels of each dimension
+    (determinant), minus the label pairs excluded by exclusions.
+
+    `dimensions` - (determinant API name, labels) pairs, in permutation
+    order
+
+    `exclusions` - (determinant API name, determinant API name, excluded
+    label pairs) triples, exclusions of determinants that are not
+    dimensions are ignored
+    """
+
+    def __init__(self,
+                 dimensions: list[tuple[str, list[str]]],
+                 exclusions: list[tuple[str, str, set[tuple[str, str]]]]):
+        self.names = [name for name, _ in dimensions]
+        self.labels = [list(dict.fromkeys(labels))
+                        for _, labels
+                        in dimensions]
+        positions = {name: i for i, name in enumerate(self.names)}
+
+        # excluded label pairs by the positions of both dimensions, the
+        # first position always being the lower
+        self.exclusions: dict[tuple[int, int], set[tuple[str, str]]] = {}
+        for name_a, name_b, excluded in exclusions:
+            pos_a = positions.get(name_a, None)
+            pos_b = positions.get(name_b, None)
+            if pos_a is None or pos_b is None or pos_a == pos_b:
+                continue
+
+            if pos_a > pos_b:
+                pos_a, pos_b = pos_b, pos_a
+                excluded = {(label_b, label_a)
+                                for label_a, label_b
+                                in excluded}
+            pairs = self.exclusions.setdefault((pos_a, pos_b), set())
+            pairs.update(excluded)
+
+        # exclusions checked once the dimension at each position is set
+        self.__checks: list[list[tuple[int, set[tuple[str, str]]]]] = [
+            [] for _ in self.names]
+        for (pos_a, pos_b), excluded in self.exclusions.items():
+            self.__checks[pos_b].append((pos_a, excluded))
+
+    def __iter__(self) -> Iterator[tuple[str, ...]]:
+        """Streams all allowed permutations in lexicographic order of
+        label positions.
+
+        Only the current permutation is held in memory, and subtrees of
+        excluded label pairs are pruned.
+        """
+
+        depth = len(self.labels)
+        if depth == 0 or any(labels == [] for labels in self.labels):
+            return
+
+        permutation: list[str] = [''] * depth
+        stack: list[Iterator[str]] = [iter(self.labels[0])]
+        while stack != []:
+            pos = len(stack) - 1
+            for label in stack[-1]:
+                if any((permutation[prev_pos], label) in excluded
+                        for prev_pos, excluded
+                        in self.__checks[pos]):
+                    continue
+
+                permutation[pos] = label
+                if pos == depth - 1:
+                    yield tuple(permutation)
+                else:
+                    stack.append(iter(self.labels[pos + 1]))
+                    break
+            else:
+                stack.pop()
+
+    def count(self) -> int:
+        """Returns the exact number of allowed permutations.
+
+        Dimensions without exclusions only multiply the count. The rest
+        are counted by dynamic programming over the labels of the
+        counted dimensions that still have exclusions with uncounted
+        dimensions (the frontier), so the product is never materialized.
+
+        Dimensions are counted in the order that keeps the fewest label
+        combinations in the frontier, rather than in permutation order.
+        For example, the dimension shared by a star of exclusions is
+        counted first, so the frontier never holds more than it.
+        """
+
+        constrained = {pos for pair in self.exclusions for pos in pair}
+        free_count = math.prod(len(labels)
+                                for pos, labels
+                                in enumerate(self.labels)
+                                if pos not in constrained)
+        if constrained == set():
+            return free_count if self.labels != [] else 0
+
+        neighbors: dict[int, set[int]] = defaultdict(set)
+        for pos_a, pos_b in self.exclusions:
+            neighbors[pos_a].add(pos_b)
+            neighbors[pos_b].add(pos_a)
+
+        uncounted = set(constrained)
+        frontier: list[int] = []
+        counts: dict[tuple[str, ...], int] = {(): 1}
+        while uncounted != set():
+            next_frontiers = {
+                pos: _next_frontier(frontier, pos, uncounted, neighbors)
+                    for pos
+                    in uncounted}
+            pos = min(sorted(uncounted),
+                      key=lambda pos: self.__state_count(next_frontiers[pos]))
+            next_frontier = next_frontiers[pos]
+            uncounted.remove(pos)
+
+            # excluded (counted label, label) pairs of each counted
+            # dimension with exclusions with `pos`, all of which are in
+            # the frontier
+            checks: list[tuple[int, set[tuple[str, str]]]] = []
+            for prev_pos in frontier:
+                if prev_pos < pos:
+                    excluded = self.exclusions.get((prev_pos, pos), None)
+                else:
+                    excluded = self.exclusions.get((pos, prev_pos), None)
+                    if excluded != None:
+                        excluded = {(label_b, label_a)
+                                        for label_a, label_b
+                                        in excluded}
+                if excluded != None:
+                    checks.append((prev_pos, excluded))
+
+            next_counts: dict[tuple[str, ...], int] = defaultdict(int)
+            for state, count in counts.items():
+                assigned = dict(zip(frontier, state))
+                for label in self.labels[pos]:
+                    if any((assigned[prev_pos], label) in excluded
+                            for prev_pos, excluded
+                            in checks):
+                        continue
+
+                    assigned[pos] = label
+                    next_state = tuple(assigned[next_pos]
+                                        for next_pos
+                                        in next_frontier)
+                    next_counts[next_state] += count
+            frontier = next_frontier
+            counts = next_counts
+        return sum(counts.values()) * free_count
+
+    def __state_count(self, frontier: list[int]) -> int:
+        return math.prod(len(self.labels[pos]) for pos in frontier)
+
+
+def _next_frontier(frontier: list[int],
+                   pos: int,
+                   uncounted: set[int],
+                   neighbors: dict[int, set[int]]
+                  ) -> list[int]:
+    """Returns the frontier once the dimension at `pos` is counted."""
+
+    return [prev_pos
+                for prev_pos
+                in frontier + [pos]
+                if any(next_pos != pos and next_pos in uncounted
+                        for next_pos
+                        in neighbors[prev_pos])]
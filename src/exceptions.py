@@ -46,3 +46,32 @@ class WidthExceededError(SummaryGenError):
     def __init__(self, message: str | None=None):
         self.message = message or 'Max width exceeded'
         super().__init__(self.message)
+
+
+def status_error(status_code: int,
+                 not_found: str | None=None,
+                 server_error: str | None=None,
+                 unauthorized: str | None=None
+                ) -> ETRMRequestError | ETRMResponseError | None:
+    """Maps an eTRM API response status code to the error it represents.
+
+    Returns `None` if `status_code` is not an error status (200, 206 or
+    304).
+
+    Errors:
+        `NotFoundError` - (404) resource not found
+
+        `ETRMResponseError` - (500) server error
+
+        `UnauthorizedError` - (!200) any other error
+    """
+
+    match status_code:
+        case 200 | 206 | 304:
+            return None
+        case 404:
+            return NotFoundError(not_found)
+        case 500:
+            return ETRMResponseError(server_error)
+        case _:
+            return UnauthorizedError(unauthorized)
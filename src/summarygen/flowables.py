@@ -1,14 +1,8 @@
 from __future__ import annotations
+from reportlab.lib.colors import Color
 from reportlab.lib.pagesizes import inch
-from reportlab.pdfbase.pdfmetrics import stringWidth
-from reportlab.platypus import (
-    Flowable,
-    Paragraph,
-    Table,
-    Spacer
-)
+from reportlab.platypus import Flowable, Paragraph, Spacer
 
-from src.etrm.models import Measure
 from src.summarygen.models import (
     ParagraphElement,
     ElemType,
@@ -17,10 +11,10 @@ from src.summarygen.models import (
 from src.summarygen.styling import (
     BetterParagraphStyle,
     PSTYLES,
-    DEF_PSTYLE,
-    TSTYLES
+    DEF_PSTYLE
 )
 from src.summarygen.rlobjects import ElementLine
+from src.summarygen.metrics import run_widths
 
 
 NEWLINE = Spacer(1, 0.3 * inch)
@@ -32,28 +26,118 @@ class Reference(Paragraph):
         Paragraph.__init__(self, text=ref_text, style=PSTYLES['ReferenceTag'])
 
 
-class ParagraphLine(Table):
-    def __init__(self, element_line: ElementLine, measure: Measure):
-        self.element_line = element_line
-        self.measure = measure
-        self.ref_link = f'{self.measure.link}/#references_list'
-        col_widths = [element.width for element in element_line]
-        row_heights = [DEF_PSTYLE.leading]
-        Table.__init__(self,
-                       [self.flowables],
-                       colWidths=col_widths,
-                       rowHeights=row_heights,
-                       style=TSTYLES['ElementLine'])
-
-    @property
-    def flowables(self) -> list[Flowable]:
-        flowables: list[Flowable] = []
-        for element in self.element_line:
-            if element.type == ElemType.REF:
-                flowables.append(Reference(element.text_xml, self.ref_link))
-            else:
-                flowables.append(Paragraph(element.text_xml, style=element.style))
-        return flowables
+# baseline shift of superscripted and subscripted text, in fractions of
+# the paragraph font size
+SUPER_RISE = 0.4
+SUB_RISE = -0.2
+
+
+class RichText(Flowable):
+    """Lines of styled text (see `parser.wrap_elements()`), drawn
+    directly onto the canvas.
+
+    Each element of a line is drawn as one run of text at the width it
+    was measured at. Reference tags are drawn over their background,
+    linking to `ref_link` if it is given.
+    """
+
+    def __init__(self,
+                 lines: list[ElementLine],
+                 style: BetterParagraphStyle=DEF_PSTYLE,
+                 ref_link: str | None=None):
+        Flowable.__init__(self)
+        self.lines = lines
+        self.pstyle = style
+        self.ref_link = ref_link
+        self.leading = style.leading
+        self.width = max((line.width for line in lines), default=0)
+        self.height = self.leading * len(lines)
+        self.hAlign = 'LEFT'
+
+    def element_font(self, element: ParagraphElement) -> tuple[str, float]:
+        """Returns the font name and size `element` is drawn in."""
+
+        return element.font_name, element.font_size
+
+    def element_color(self, element: ParagraphElement) -> Color:
+        """Returns the color `element` is drawn in."""
+
+        return element.style.textColor
+
+    def wrap(self, availWidth: float, availHeight: float
+            ) -> tuple[float, float]:
+        return self.width, self.height
+
+    def draw(self):
+        canvas = self.canv
+        font_size = self.pstyle.font_size
+        runs: list[tuple[ParagraphElement, float, float]] = []
+        top = self.height
+        for line in self.lines:
+            baseline = top - font_size
+            x = 0.0
+            for element, width in zip(line.elements, line.widths):
+                if element.type == ElemType.REF:
+                    bottom = top - self.leading
+                    canvas.setFillColor(element.style.backColor)
+                    canvas.rect(x, bottom, width, self.leading,
+                                stroke=0,
+                                fill=1)
+                    if self.ref_link != None:
+                        canvas.linkURL(self.ref_link,
+                                       (x, bottom, x + width, top),
+                                       relative=1)
+                    runs.append((element, x, baseline))
+                elif TextStyle.SUP in element.styles:
+                    rise = font_size * SUPER_RISE
+                    runs.append((element, x, baseline + rise))
+                elif TextStyle.SUB in element.styles:
+                    rise = font_size * SUB_RISE
+                    runs.append((element, x, baseline + rise))
+                else:
+                    runs.append((element, x, baseline))
+                x += width
+            top -= self.leading
+
+        # all runs are drawn in one text object, over the backgrounds,
+        # each at its own origin, so the cursor is never advanced by
+        # re-measuring the run (as `textOut()` would)
+        text = canvas.beginText()
+        font = None
+        color = None
+        for element, x, y in runs:
+            text.setTextOrigin(x, y)
+            element_font = self.element_font(element)
+            if font != element_font:
+                font = element_font
+                text.setFont(*font)
+            element_color = self.element_color(element)
+            if color != element_color:
+                color = element_color
+                text.setFillColor(color)
+            text.textLine(element.text)
+        canvas.drawText(text)
+
+
+class SummaryParagraph(RichText):
+    """Technology summary paragraph, drawn directly onto the canvas.
+
+    Reference tags link to `ref_link`. The paragraph splits between
+    lines.
+    """
+
+    def __init__(self, lines: list[ElementLine], ref_link: str):
+        RichText.__init__(self, lines, DEF_PSTYLE, ref_link)
+
+    def split(self, availWidth: float, availHeight: float
+             ) -> list[SummaryParagraph]:
+        line_count = int(availHeight / self.leading + 1e-6)
+        if line_count <= 0:
+            return []
+        if line_count >= len(self.lines):
+            return [self]
+        return [SummaryParagraph(self.lines[:line_count], self.ref_link),
+                SummaryParagraph(self.lines[line_count:], self.ref_link)]
 
 
 class ValueTableHeader(Paragraph):
@@ -67,66 +151,77 @@ class ValueTableHeader(Paragraph):
         Paragraph.__init__(self, header_text, style=style)
 
 
-class TableCell(Table):
+def cell_element_style(element: ParagraphElement,
+                       style: BetterParagraphStyle | None=None
+                      ) -> BetterParagraphStyle:
+    """Returns the paragraph style of `element` in a table cell of
+    `style`.
+    """
+
+    if element.type == ElemType.REF:
+        return PSTYLES['ReferenceTag']
+    elif style != None:
+        return style
+    elif (TextStyle.STRONG in element.styles
+            and TextStyle.ITALIC in element.styles):
+        return PSTYLES['ParagraphBoldItalic']
+    elif TextStyle.STRONG in element.styles:
+        return PSTYLES['ParagraphBold']
+    elif TextStyle.ITALIC in element.styles:
+        return PSTYLES['ParagraphItalic']
+    else:
+        return PSTYLES['Paragraph']
+
+
+def cell_font(element: ParagraphElement,
+              style: BetterParagraphStyle | None=None
+             ) -> tuple[str, float]:
+    """Returns the font name and size of `element` in a table cell of
+    `style`.
+    """
+
+    element_style = cell_element_style(element, style)
+    font_size = element_style.font_size
+    if TextStyle.SUB in element.styles:
+        font_size = element_style.sub_size
+    if TextStyle.SUP in element.styles:
+        font_size = element_style.sup_size
+    return element_style.font_name, font_size
+
+
+def measure_cells(cells: list[list[ParagraphElement]],
+                  style: BetterParagraphStyle | None=None
+                 ) -> list[list[float]]:
+    """Returns the width of each element of each table cell of `style`.
+
+    The elements of all cells are measured at once, grouped by font.
+    """
+
+    runs = [(element.text, *cell_font(element, style))
+                for elements
+                in cells
+                for element
+                in elements]
+    widths = iter(run_widths(runs))
+    return [[next(widths) for _ in elements] for elements in cells]
+
+
+class TableCell(RichText):
+    """Table cell of pre-broken lines, drawn directly onto the canvas.
+
+    Elements are drawn in the style of a cell of `style` (see
+    `cell_element_style()`). The height of the cell is the height of its
+    lines.
+    """
+
     def __init__(self,
-                 elements: list[ParagraphElement],
-                 max_width: float,
+                 lines: list[ElementLine],
                  style: BetterParagraphStyle | None=None):
-        self.elements = elements
-        self.pstyle = style
-        self.height = 0
-        self.width = 0
-        self.max_width = max_width
-        self.col_widths: list[float] = []
-        line = self.join_elements()
-        Table.__init__(self,
-                       [line],
-                       colWidths=self.col_widths,
-                       rowHeights=self.height,
-                       style=TSTYLES['ElementLine'],
-                       hAlign='LEFT')
-
-    def element_style(self, element: ParagraphElement) -> BetterParagraphStyle:
-        if element.type == ElemType.REF:
-            return PSTYLES['ReferenceTag']
-        elif self.pstyle != None:
-            return self.pstyle
-        elif (TextStyle.STRONG in element.styles
-                and TextStyle.ITALIC in element.styles):
-            return PSTYLES['ParagraphBoldItalic']
-        elif TextStyle.STRONG in element.styles:
-            return PSTYLES['ParagraphBold']
-        elif TextStyle.ITALIC in element.styles:
-            return PSTYLES['ParagraphItalic']
-        else:
-            return PSTYLES['Paragraph']
-
-    def join_elements(self) -> list[Flowable]:
-        self.height = 0
-        self.width = 0
-        self.col_widths = []
-        line: list[Flowable] = []
-        for element in self.elements:
-            style = self.element_style(element)
-            text = element.text
-            font_size = style.font_size
-            if TextStyle.SUB in element.styles:
-                font_size = style.sub_size
-                text = f'<sub>{text}</sub>'
-            if TextStyle.SUP in element.styles:
-                font_size = style.sup_size
-                text = f'<super>{text}</super>'
-            element_width = stringWidth(element.text,
-                                        style.font_name,
-                                        font_size)
-            height = style.leading
-            if element_width > self.max_width:
-                scale = element_width // self.max_width
-                element_width = self.max_width
-                height *= scale + 1
-                height += 6
-            self.height = max(height, self.height)
-            self.width += element_width
-            self.col_widths.append(element_width)
-            line.append(Paragraph(text, style=style))
-        return line
+        self.cell_style = style
+        RichText.__init__(self, lines, style or DEF_PSTYLE)
+
+    def element_font(self, element: ParagraphElement) -> tuple[str, float]:
+        return cell_font(element, self.cell_style)
+
+    def element_color(self, element: ParagraphElement) -> Color:
+        return cell_element_style(element, self.cell_style).textColor
@@ -0,0 +1,283 @@
+from __future__ import annotations
+import threading
+import numpy as np
+import numpy.typing as npt
+from collections import OrderedDict
+from typing import Mapping, NamedTuple, Sequence
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfbase.ttfonts import TTFont
+
+
+# maximum number of cached text widths
+MAX_WIDTH_ENTRIES = 64 * 1024
+
+# codepoints below this limit have their advances stored in a dense
+# table, covering the Latin, Greek and Cyrillic scripts, punctuation and
+# most symbols
+DENSE_LIMIT = 0x3000
+
+# minimum text length measured with glyph advances rather than
+# `stringWidth()`, shorter texts are faster to measure one glyph at a
+# time
+VECTOR_MIN_LENGTH = 256
+
+
+class WidthCacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return 0.0 if lookups == 0 else self.hits / lookups
+
+
+class WidthCache:
+    """Thread-safe least recently used cache of text widths.
+
+    Widths are keyed by `(text, font_name, font_size)`. The least
+    recently used widths are evicted once the cache holds more than
+    `max_entries` widths.
+    """
+
+    def __init__(self, max_entries: int=MAX_WIDTH_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__widths: OrderedDict[tuple[str, str, float], float] = (
+            OrderedDict())
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__widths)
+
+    @property
+    def stats(self) -> WidthCacheStats:
+        with self.__lock:
+            return WidthCacheStats(self.hits,
+                                   self.misses,
+                                   self.evictions,
+                                   len(self.__widths))
+
+    def width(self, text: str, font_name: str, font_size: float) -> float:
+        """Returns the width of `text` in the font `font_name` at
+        `font_size`.
+
+        Errors:
+            `KeyError` - the font is not registered
+        """
+
+        key = (text, font_name, font_size)
+        with self.__lock:
+            width = self.__widths.get(key, None)
+            if width != None:
+                self.hits += 1
+                self.__widths.move_to_end(key)
+                return width
+            self.misses += 1
+
+        advances = FONT_ADVANCES.get(font_name, None)
+        if advances != None and len(text) >= VECTOR_MIN_LENGTH:
+            width = advances.width(text, font_size)
+        else:
+            width = stringWidth(text, font_name, font_size)
+        with self.__lock:
+            self.__widths[key] = width
+            self.__evict()
+        return width
+
+    def resize(self, max_entries: int):
+        """Sets a new limit and evicts widths that no longer fit."""
+
+        with self.__lock:
+            self.max_entries = max_entries
+            self.__evict()
+
+    def clear(self):
+        """Removes all widths and resets the stats."""
+
+        with self.__lock:
+            self.__widths.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __evict(self):
+        while len(self.__widths) > self.max_entries:
+            self.__widths.popitem(last=False)
+            self.evictions += 1
+
+
+def codepoints(text: str) -> npt.NDArray[np.uint32]:
+    """Returns the codepoints of `text`."""
+
+    return np.frombuffer(text.encode('utf-32-le', 'surrogatepass'),
+                         dtype=np.uint32)
+
+
+class GlyphAdvances:
+    """Glyph advance widths of a TrueType font, in thousandths of the
+    font size.
+
+    Advances of codepoints below `DENSE_LIMIT` are looked up in a dense
+    table indexed by codepoint, all other advances are looked up in a
+    table sorted by codepoint. Codepoints without a glyph advance by the
+    default width of the font.
+
+    Text is measured the same way as `stringWidth()`, as the sum of the
+    advances of its codepoints.
+    """
+
+    __slots__ = ('default_width', '__dense', '__codepoints', '__widths')
+
+    def __init__(self, char_widths: Mapping[int, float], default_width: float):
+        self.default_width = default_width
+        self.__dense = np.full(DENSE_LIMIT, default_width, dtype=np.float32)
+        sparse: list[tuple[int, float]] = []
+        for codepoint, width in char_widths.items():
+            if codepoint < DENSE_LIMIT:
+                self.__dense[codepoint] = width
+            else:
+                sparse.append((codepoint, width))
+        sparse.sort()
+        self.__codepoints = np.array([codepoint for codepoint, _ in sparse],
+                                     dtype=np.uint32)
+        self.__widths = np.array([width for _, width in sparse],
+                                 dtype=np.float32)
+
+    @classmethod
+    def from_font(cls, font: TTFont) -> GlyphAdvances:
+        return cls(font.face.charWidths, font.face.defaultWidth)
+
+    def advances(self,
+                 text_codepoints: npt.NDArray[np.uint32]
+                ) -> npt.NDArray[np.float64]:
+        """Returns the advance of each of `text_codepoints`."""
+
+        dense = text_codepoints < DENSE_LIMIT
+        if dense.all():
+            return self.__dense[text_codepoints].astype(np.float64)
+
+        advances = np.full(text_codepoints.shape,
+                           self.default_width,
+                           dtype=np.float64)
+        advances[dense] = self.__dense[text_codepoints[dense]]
+        sparse = text_codepoints[~dense]
+        if self.__codepoints.size != 0:
+            indexes = np.searchsorted(self.__codepoints, sparse)
+            indexes = np.minimum(indexes, self.__codepoints.size - 1)
+            found = self.__codepoints[indexes] == sparse
+            advances[~dense] = np.where(found,
+                                        self.__widths[indexes],
+                                        self.default_width)
+        return advances
+
+    def width(self, text: str, font_size: float) -> float:
+        """Returns the width of `text` at `font_size`."""
+
+        advances = self.advances(codepoints(text))
+        return float(advances.sum()) * 0.001 * font_size
+
+    def widths(self,
+               texts: Sequence[str],
+               font_size: float
+              ) -> npt.NDArray[np.float64]:
+        """Returns the width of each of `texts` at `font_size`, measured
+        with one lookup over the codepoints of all texts.
+        """
+
+        lengths = np.fromiter(map(len, texts),
+                              dtype=np.intp,
+                              count=len(texts))
+        ends = np.cumsum(lengths)
+        sums = np.zeros(ends[-1] + 1 if len(texts) != 0 else 1)
+        np.cumsum(self.advances(codepoints(''.join(texts))), out=sums[1:])
+        return (sums[ends] - sums[ends - lengths]) * 0.001 * font_size
+
+
+# glyph advances of the registered TrueType fonts, by font name
+FONT_ADVANCES: dict[str, GlyphAdvances] = {}
+
+
+def register_advances(font: TTFont):
+    """Precomputes the glyph advances of `font`, enabling vectorized
+    measurement of text in `font`.
+    """
+
+    FONT_ADVANCES[font.fontName] = GlyphAdvances.from_font(font)
+
+
+WIDTH_CACHE = WidthCache()
+
+
+def string_width(text: str, font_name: str, font_size: float) -> float:
+    """Returns the width of `text` in the font `font_name` at
+    `font_size`, measured once per process (see `WIDTH_CACHE`).
+
+    Use in place of `stringWidth()`.
+    """
+
+    return WIDTH_CACHE.width(text, font_name, font_size)
+
+
+def string_widths(texts: Sequence[str],
+                  font_name: str,
+                  font_size: float
+                 ) -> npt.NDArray[np.float64]:
+    """Returns the width of each of `texts` in the font `font_name` at
+    `font_size`.
+
+    Texts in fonts with glyph advances (see `register_advances()`) are
+    all measured at once, texts in other fonts are measured one by one
+    with `string_width()`.
+    """
+
+    advances = FONT_ADVANCES.get(font_name, None)
+    if advances is None:
+        return np.fromiter((string_width(text, font_name, font_size)
+                                for text
+                                in texts),
+                           dtype=np.float64,
+                           count=len(texts))
+    return advances.widths(texts, font_size)
+
+
+def char_widths(text: str,
+                font_name: str,
+                font_size: float
+               ) -> npt.NDArray[np.float64]:
+    """Returns the width of each character of `text` in the font
+    `font_name` at `font_size`.
+    """
+
+    advances = FONT_ADVANCES.get(font_name, None)
+    if advances is None:
+        return np.fromiter((string_width(char, font_name, font_size)
+                                for char
+                                in text),
+                           dtype=np.float64,
+                           count=len(text))
+    return advances.advances(codepoints(text)) * 0.001 * font_size
+
+
+def run_widths(runs: Sequence[tuple[str, str, float]]) -> list[float]:
+    """Returns the width of each `(text, font_name, font_size)` run.
+
+    Runs are grouped by font and size, each group is measured at once
+    with `string_widths()`.
+    """
+
+    groups: dict[tuple[str, float], list[int]] = {}
+    for i, (_, font_name, font_size) in enumerate(runs):
+        groups.setdefault((font_name, font_size), []).append(i)
+
+    widths: list[float] = [0.0] * len(runs)
+    for (font_name, font_size), indexes in groups.items():
+        texts = [runs[i][0] for i in indexes]
+        group_widths = string_widths(texts, font_name, font_size).tolist()
+        for i, width in zip(indexes, group_widths):
+            widths[i] = width
+    return widths
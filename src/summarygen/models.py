@@ -1,11 +1,12 @@
 from __future__ import annotations
 import json
 from enum import Enum
-from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib.fonts import tt2ps
 
 from src.utils import getc
 from src.exceptions import ElementJoinError
 from src.summarygen.styling import DEF_PSTYLE, BetterParagraphStyle, PSTYLES
+from src.summarygen.metrics import string_width
 
 
 class ElemType(Enum):
@@ -25,6 +26,8 @@ class TextStyle(Enum):
 class ParagraphElement:
     """Defines an element found in an HTML document."""
 
+    __slots__ = ('text', 'type', 'styles')
+
     def __init__(self,
                  text: str,
                  type: ElemType=ElemType.TEXT,
@@ -77,11 +80,25 @@ class ParagraphElement:
 
     @property
     def font_name(self) -> str:
-        return self.style.font_name
+        """The name of the font face the element is drawn in, the bold
+        and/or italic face of its style's font family if the element is
+        strong and/or italic.
+        """
+
+        font_name = self.style.font_name
+        bold = int(TextStyle.STRONG in self.styles)
+        italic = int(TextStyle.ITALIC in self.styles)
+        if not bold and not italic:
+            return font_name
+
+        try:
+            return tt2ps(font_name, bold, italic)
+        except ValueError:
+            return font_name
 
     @property
     def width(self) -> float:
-        return stringWidth(self.text, self.font_name, self.font_size)
+        return string_width(self.text, self.font_name, self.font_size)
 
     @property
     def height(self) -> float:
@@ -111,6 +128,13 @@ class ParagraphElement:
 
 
 class ObjectInfo:
+    __slots__ = ('id',
+                 'title',
+                 'ctype_id',
+                 'verbose_name',
+                 'verbose_name_plural',
+                 'change_url')
+
     def __init__(self, json_obj: dict):
         self.id = getc(json_obj, 'id', str)
         self.title = getc(json_obj, 'title', str)
@@ -121,6 +145,8 @@ class ObjectInfo:
 
 
 class RefObjectInfo(ObjectInfo):
+    __slots__ = ('preview_url', 'ref_type')
+
     def __init__(self, json_obj: dict):
         super().__init__(json_obj)
         self.preview_url = getc(json_obj, 'preview_url', str)
@@ -128,6 +154,8 @@ class RefObjectInfo(ObjectInfo):
 
 
 class ReferenceTag(ParagraphElement):
+    __slots__ = ('_json_str', 'obj_info', 'ref_type', 'obj_deleted')
+
     def __init__(self, json_str: str):
         self._json_str = json_str
         json_obj: dict = json.loads(json_str)
@@ -151,12 +179,16 @@ class ReferenceTag(ParagraphElement):
 
 
 class VTConfig:
+    __slots__ = ('ver', 'cids')
+
     def __init__(self, json_obj: dict):
         self.ver = getc(json_obj, 'ver', int)
         self.cids = getc(json_obj, 'cids', list[str])
 
 
 class VTObjectInfo(ObjectInfo):
+    __slots__ = ('api_name_unique', 'vtconf')
+
     def __init__(self, json_obj: dict):
         super().__init__(json_obj)
         self.api_name_unique = getc(json_obj, 'api_name_unique', str)
@@ -164,6 +196,8 @@ class VTObjectInfo(ObjectInfo):
 
 
 class EmbeddedValueTableTag:
+    __slots__ = ('_json_str', '_json', 'obj_info', 'obj_deleted')
+
     def __init__(self, json_str: str):
         self._json_str = json_str
         self._json: dict = json.loads(json_str)
@@ -172,6 +206,8 @@ class EmbeddedValueTableTag:
 
 
 class ImgObjectInfo(ObjectInfo):
+    __slots__ = ('preview_url', 'width', 'image_url')
+
     def __init__(self, json_obj: dict):
         super().__init__(json_obj)
         self.preview_url = getc(json_obj, 'preview_url', str)
@@ -180,6 +216,8 @@ class ImgObjectInfo(ObjectInfo):
 
 
 class EmbeddedImage:
+    __slots__ = ('_json_str', '_json', 'obj_info', 'caption', 'align')
+
     def __init__(self, json_str: str):
         self._json_str = json_str
         self._json: dict = json.loads(json_str)
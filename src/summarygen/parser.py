@@ -1,8 +1,12 @@
 from __future__ import annotations
+import re
 import requests
 import shutil
+import bisect
 import os
 import math
+import numpy as np
+from typing import Callable
 from bs4 import (
     BeautifulSoup,
     Tag,
@@ -12,7 +16,6 @@ from bs4 import (
 )
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, inch
-from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.platypus import (
     Flowable,
     Paragraph,
@@ -27,12 +30,10 @@ from reportlab.platypus import (
 from src import _ROOT
 from src.etrm import ETRM_URL, ETRMConnection
 from src.etrm.models import Measure, ValueTable
-from src.exceptions import (
-    SummaryGenError,
-    WidthExceededError
-)
+from src.exceptions import SummaryGenError
 from src.summarygen.models import (
     ParagraphElement,
+    ElemType,
     ReferenceTag,
     EmbeddedValueTableTag,
     TextStyle,
@@ -40,20 +41,27 @@ from src.summarygen.models import (
 )
 from src.summarygen.styling import (
     BetterTableStyle,
+    BetterParagraphStyle,
     PSTYLES,
-    DEF_PSTYLE,
-    TSTYLES,
     INNER_WIDTH,
     X_MARGIN,
     PAGESIZE,
     value_table_style
 )
+from src.summarygen.metrics import (
+    string_width,
+    string_widths,
+    char_widths,
+    codepoints
+)
 from src.summarygen.flowables import (
     TableCell,
+    cell_font,
+    measure_cells,
     Reference,
     ValueTableHeader,
     ElementLine,
-    ParagraphLine,
+    SummaryParagraph,
     NEWLINE
 )
 
@@ -120,6 +128,32 @@ def _parse_elements(elements: list[PageElement]) -> list[ParagraphElement]:
     return contents
 
 
+def parse_cells(cells: list[list[ParagraphElement]],
+                max_widths: list[float],
+                style: BetterParagraphStyle | None=None
+               ) -> list[TableCell]:
+    """Returns the table cell of `style` of each of `cells`, broken into
+    lines no wider than the cell's max width.
+
+    The elements of all cells are measured at once, only cells wider
+    than their max width are broken into lines.
+    """
+
+    cells = [collapse_whitespace(elements) for elements in cells]
+    cell_widths = measure_cells(cells, style)
+    font = lambda element: cell_font(element, style)
+    table_cells: list[TableCell] = []
+    for elements, widths, max_width in zip(cells, cell_widths, max_widths):
+        if elements == []:
+            lines = []
+        elif math.fsum(widths) > max_width:
+            lines = wrap_elements(elements, max_width, font)
+        else:
+            lines = [ElementLine(elements, max_width=None, widths=widths)]
+        table_cells.append(TableCell(lines, style))
+    return table_cells
+
+
 def parse_table_headers(table: Tag) -> list[TableCell]:
     thead = table.find('thead')
     raw_headers: ResultSet[Tag] = []
@@ -130,13 +164,12 @@ def parse_table_headers(table: Tag) -> list[TableCell]:
     else:
         raise SummaryGenError('missing table headers')
     max_width = (letter[0] - 3.25 * inch) / len(raw_headers)
-    headers: list[TableCell] = []
-    for raw_header in raw_headers:
-        header_elements = _parse_element(raw_header)
-        headers.append(TableCell(header_elements,
-                                 max_width,
-                                 style=PSTYLES['ValueTableHeader']))
-    return headers
+    header_elements = [_parse_element(raw_header)
+                        for raw_header
+                        in raw_headers]
+    return parse_cells(header_elements,
+                       [max_width] * len(header_elements),
+                       PSTYLES['ValueTableHeader'])
 
 
 def parse_table_body(table: Tag) -> list[list[TableCell]]:
@@ -144,16 +177,23 @@ def parse_table_body(table: Tag) -> list[list[TableCell]]:
     if not isinstance(tbody, Tag):
         raise SummaryGenError('missing table body')
     raw_rows: ResultSet[Tag] = tbody.find_all('tr')
-    body_rows: list[list[TableCell]] = []
-    for raw_row in raw_rows:
-        raw_cells: ResultSet[Tag] = raw_row.find_all('td')
-        max_width = (letter[0] - 3.25 * inch) / len(raw_cells)
-        cells: list[TableCell] = []
-        for raw_cell in raw_cells:
-            cell_elements = _parse_element(raw_cell)
-            cells.append(TableCell(cell_elements, max_width))
-        body_rows.append(cells)
-    return body_rows
+    row_elements = [[_parse_element(raw_cell)
+                        for raw_cell
+                        in raw_row.find_all('td')]
+                    for raw_row
+                    in raw_rows]
+
+    # the cells of all rows are parsed at once
+    cells: list[list[ParagraphElement]] = []
+    max_widths: list[float] = []
+    for cell_elements in row_elements:
+        max_width = (letter[0] - 3.25 * inch) / len(cell_elements)
+        cells.extend(cell_elements)
+        max_widths.extend([max_width] * len(cell_elements))
+    table_cells = iter(parse_cells(cells, max_widths))
+    return [[next(table_cells) for _ in cell_elements]
+                for cell_elements
+                in row_elements]
 
 
 def parse_table(table: Tag) -> list[list[TableCell]]:
@@ -169,7 +209,7 @@ def calc_col_width(element: TableCell | str,
                    style: BetterTableStyle
                   ) -> float:
     if isinstance(element, str):
-        width = stringWidth(element, style.font_name, style.font_size)
+        width = string_width(element, style.font_name, style.font_size)
     else:
         width = element.width
     padding = style.left_padding + style.right_padding
@@ -180,13 +220,22 @@ def calc_col_widths(data: list[list[TableCell | str]],
                     style: BetterTableStyle
                    ) -> list[float]:
     headers = data[0]
+    padding = style.left_padding + style.right_padding
     col_widths: list[float] = list(range(len(headers)))
     for i in range(len(headers)):
+        column = [row[i] for row in data]
+
+        # text cells of a column are measured at once
+        texts = [cell for cell in column if isinstance(cell, str)]
         max_width = 0
-        for j in range(len(data)):
-            col_width = calc_col_width(data[j][i], style)
-            if col_width > max_width:
-                max_width = col_width
+        if texts != []:
+            text_widths = string_widths(texts,
+                                        style.font_name,
+                                        style.font_size)
+            max_width = float(text_widths.max()) + padding
+        for cell in column:
+            if not isinstance(cell, str):
+                max_width = max(calc_col_width(cell, style), max_width)
         col_widths[i] = max_width
     return col_widths
 
@@ -216,87 +265,248 @@ def calc_row_heights(data: list[list[TableCell | str]],
     return row_heights
 
 
-def split_word(element: ParagraphElement,
-               avail_width: float=INNER_WIDTH
-              ) -> list[ParagraphElement]:
-    width = avail_width
-    word: str = element.text
-    fractions: list[ParagraphElement] = []
-    while word != '':
-        i = 0
-        while i < len(word):
-            if element.copy(word[0:i]).width > width:
-                break
+# breakable whitespace, other whitespace (e.g., non-breaking spaces) is
+# part of words
+_BREAKABLE_CHARS = ' \t\n\r\f\v'
+_BREAKABLE = np.array([ord(char) for char in _BREAKABLE_CHARS],
+                      dtype=np.uint32)
+
+_WHITESPACE = re.compile(r'[ \t\n\r\f\v]+')
+
+
+def collapse_whitespace(elements: list[ParagraphElement]
+                       ) -> list[ParagraphElement]:
+    """Returns `elements` with each run of breakable whitespace replaced
+    by one space, and the whitespace at either end removed, as HTML text
+    is rendered.
+
+    Elements with changed text are copied, reference tags are kept as
+    they are.
+    """
+
+    collapsed: list[ParagraphElement] = []
+    space = True
+    for element in elements:
+        if element.type == ElemType.REF:
+            collapsed.append(element)
+            space = False
+            continue
+
+        text = _WHITESPACE.sub(' ', element.text)
+        if space:
+            text = text.lstrip(' ')
+        if text == '':
+            continue
+
+        space = text.endswith(' ')
+        if text == element.text:
+            collapsed.append(element)
+        else:
+            collapsed.append(ParagraphElement(text,
+                                              element.type,
+                                              element.styles))
+
+    if space and collapsed != []:
+        last = collapsed.pop()
+        if last.text != ' ':
+            collapsed.append(ParagraphElement(last.text[:-1],
+                                              last.type,
+                                              last.styles))
+    return collapsed
+
+
+# returns the font name and size an element is measured in
+_ElementFont = Callable[[ParagraphElement], tuple[str, float]]
+
+
+def _element_font(element: ParagraphElement) -> tuple[str, float]:
+    return element.font_name, element.font_size
+
+
+class _ParagraphText:
+    """Text of paragraph elements, tokenized for line breaking.
+
+    The text of all elements is joined and measured once, giving the
+    width of each prefix of the text. Words are the runs of characters
+    between breakable whitespace. Reference tags are unbreakable and
+    separated from neighbouring text by a space, which is added unless
+    the text already ends or starts with breakable whitespace.
+    """
+
+    def __init__(self,
+                 elements: list[ParagraphElement],
+                 font: _ElementFont):
+        elements = [element for element in elements if element.text != '']
+        self.segments: list[ParagraphElement] = []
+        for i, element in enumerate(elements):
+            if element.type != ElemType.REF:
+                self.segments.append(element)
+                continue
+
+            if (self.segments != []
+                    and self.segments[-1].text[-1] not in _BREAKABLE_CHARS):
+                self.segments.append(ParagraphElement(' ', ElemType.SPACE))
+            self.segments.append(element)
+            if (i + 1 < len(elements)
+                    and elements[i + 1].text[0] not in _BREAKABLE_CHARS):
+                self.segments.append(ParagraphElement(' ', ElemType.SPACE))
+
+        texts = [segment.text for segment in self.segments]
+        text = ''.join(texts)
+        lengths = np.fromiter(map(len, texts),
+                              dtype=np.intp,
+                              count=len(texts))
+        starts = np.zeros(len(texts) + 1, dtype=np.intp)
+        np.cumsum(lengths, out=starts[1:])
+
+        # the texts of all segments in the same font are measured at
+        # once, the full width of a reference tag is placed on its first
+        # character
+        advances = np.zeros(len(text))
+        in_tag = np.zeros(len(text) + 1, dtype=np.bool_)
+        fonts: dict[tuple[str, float], list[int]] = {}
+        for i, segment in enumerate(self.segments):
+            if segment.type == ElemType.REF:
+                advances[starts[i]] = segment.width
+                in_tag[starts[i]:starts[i + 1]] = True
+            else:
+                fonts.setdefault(font(segment), []).append(i)
+        for (font_name, font_size), indexes in fonts.items():
+            font_lengths = lengths[indexes]
+            offsets = starts[indexes] - (np.cumsum(font_lengths)
+                                            - font_lengths)
+            positions = (np.repeat(offsets, font_lengths)
+                            + np.arange(font_lengths.sum()))
+            advances[positions] = char_widths(
+                ''.join(texts[i] for i in indexes),
+                font_name,
+                font_size)
+
+        prefixes = np.zeros(len(text) + 1)
+        np.cumsum(advances, out=prefixes[1:])
+
+        breakable = np.isin(codepoints(text), _BREAKABLE) & ~in_tag[:-1]
+        edges = np.diff(np.concatenate(([True], breakable, [True]))
+                            .astype(np.int8))
+
+        self.starts: list[int] = starts.tolist()
+        self.prefixes: list[float] = prefixes.tolist()
+        self.word_starts: list[int] = np.flatnonzero(edges == -1).tolist()
+        self.word_ends: list[int] = np.flatnonzero(edges == 1).tolist()
+        self.word_end_widths: list[float] = prefixes[self.word_ends].tolist()
+
+        # positions within reference tags, which cannot be split at
+        in_tag[starts[:-1]] = False
+        self.unsplittable: list[bool] = in_tag.tolist()
+
+    def split_point(self, start: int, limit: float, force: bool) -> int:
+        """Returns the last position after `start` at which the text can
+        be split without exceeding the prefix width `limit`.
+
+        If `force` is true, the position is at least one character
+        after `start`.
+        """
+
+        pos = bisect.bisect_right(self.prefixes, limit) - 1
+        while pos > start and self.unsplittable[pos]:
+            pos -= 1
+        if force and pos <= start:
+            pos = start + 1
+            while self.unsplittable[pos]:
+                pos += 1
+        return pos
+
+    def line(self, start: int, end: int, max_width: float) -> ElementLine:
+        """Returns the line of the text between `start` and `end`.
+
+        Adjacent segments of the same type and styles are joined.
+        """
+
+        elements: list[ParagraphElement] = []
+        widths: list[float] = []
+        i = bisect.bisect_right(self.starts, start) - 1
+        while self.starts[i] < end:
+            segment = self.segments[i]
+            seg_start = self.starts[i]
+            text_start = max(start, seg_start)
+            text_end = min(end, self.starts[i + 1])
+            text = segment.text[text_start - seg_start:text_end - seg_start]
+            width = self.prefixes[text_end] - self.prefixes[text_start]
             i += 1
-        fractions.append(element.copy(word[0:i]))
-        word[0:i] = ''
-        width = INNER_WIDTH
-    return fractions
-
-
-def split_element(element: ParagraphElement) -> list[ParagraphElement]:
-    elements: list[ParagraphElement] = []
-    words = element.text.split()
-    word_count = len(words)
-    if word_count == 0:
-        return elements
-    elif word_count == 1:
-        elements.append(element)
-        return elements
-
-    if element.text == '':
-        return elements
-
-    if element.text[0] == ' ':
-        words[0] = f' {words[0]}'
-
-    if len(element.text) > 1 and element.text[-1] == ' ':
-        words[-1] = f'{words[-1]} '
-
-    if word_count == 2:
-        elements.append(element.copy(f'{words[0]} '))
-        elements.append(element.copy(words[1]))
-    else:
-        for i, word in enumerate(words):
-            if i == 0:
-                elem_cpy = element.copy(word)
+            if segment.type == ElemType.REF:
+                elements.append(segment)
+                widths.append(width)
+            elif (elements != []
+                    and elements[-1].type == segment.type
+                    and elements[-1].styles == segment.styles):
+                elements[-1].text += text
+                widths[-1] += width
             else:
-                elem_cpy = element.copy(f' {word}')
-            elements.append(elem_cpy)
-    return list(filter(lambda e: e.text != '', elements))
+                elements.append(ParagraphElement(text,
+                                                 segment.type,
+                                                 segment.styles))
+                widths.append(width)
+
+        # lines of one character wider than `max_width` are unbounded
+        if math.fsum(widths) > max_width:
+            return ElementLine(elements, max_width=None, widths=widths)
+        return ElementLine(elements, max_width=max_width, widths=widths)
 
 
 def wrap_elements(elements: list[ParagraphElement],
-                  max_width: float=INNER_WIDTH
+                  max_width: float=INNER_WIDTH,
+                  font: _ElementFont=_element_font
                  ) -> list[ElementLine]:
+    """Breaks `elements` into lines no wider than `max_width`, measuring
+    each element in the font name and size returned by `font`.
+
+    Runs of whitespace are collapsed to one space (see
+    `collapse_whitespace()`). Lines are broken at whitespace, filling
+    each line with as many words as fit. Whitespace at the start and end
+    of lines is dropped. Words wider than `max_width` are broken at the
+    characters that fill the rest of the line.
+
+    The elements are measured once, and the end of each line is found
+    by binary search over the widths of the text up to each word.
+    """
+
+    text = _ParagraphText(collapse_whitespace(elements), font)
+    word_starts = text.word_starts
+    word_ends = text.word_ends
+    end_widths = text.word_end_widths
+    word_count = len(word_starts)
+
     element_lines: list[ElementLine] = []
-    current_line = ElementLine(max_width=max_width)
-    for element in elements:
-        try:
-            current_line.add(element)
-        except WidthExceededError:
-            split_elems = split_element(element)
-            for elem in split_elems:
-                try:
-                    current_line.add(elem)
-                except WidthExceededError:
-                    if elem.width > max_width:
-                        avail_width = max_width - current_line.width
-                        word_frags = split_word(elem.width, avail_width)
-                        current_line.add(word_frags[0])
-                        element_lines.append(current_line)
-                        if len(word_frags) > 1:
-                            for word_frag in word_frags[1:len(word_frags) - 1]:
-                                current_line = ElementLine(max_width=max_width)
-                                current_line.add(word_frag)
-                        else:
-                            current_line = ElementLine(max_width=max_width)
-                    else:
-                        element_lines.append(current_line)
-                        current_line = ElementLine(max_width=max_width)
-                        current_line.add(elem)
-    if len(current_line) != 0:
-        element_lines.append(current_line)
+    word = 0
+    pos = word_starts[0] if word_count != 0 else 0
+    while word < word_count:
+        limit = text.prefixes[pos] + max_width
+        last_word = bisect.bisect_right(end_widths, limit, lo=word) - 1
+        if last_word < word:
+            # the word is too long for any line
+            end = text.split_point(pos, limit, force=True)
+        else:
+            end = word_ends[last_word]
+            word = last_word + 1
+
+            # a following word that is too long for any line fills the
+            # rest of the line
+            if (word < word_count
+                    and (end_widths[word]
+                            - text.prefixes[word_starts[word]]) > max_width):
+                split = text.split_point(word_starts[word], limit, False)
+                if split > word_starts[word]:
+                    end = split
+
+        element_lines.append(text.line(pos, end, max_width))
+        if word < word_count and end < word_starts[word]:
+            pos = word_starts[word]
+        else:
+            pos = end
+        if word < word_count and pos == word_ends[word]:
+            word += 1
+            if word < word_count:
+                pos = word_starts[word]
     return element_lines
 
 
@@ -330,20 +540,13 @@ class CharacterizationParser:
 
     def gen_summary_paragraph(self,
                               elements: list[PageElement]
-                             ) -> Table | None:
-        lines = [[ParagraphLine(line, self.measure)]
-                    for line
-                    in wrap_elements(elements)]
+                             ) -> SummaryParagraph | None:
+        lines = wrap_elements(elements)
         if lines == []:
             return None
 
-        col_widths = [INNER_WIDTH]
-        row_heights = [DEF_PSTYLE.leading] * len(lines)
-        return Table(lines,
-                     colWidths=col_widths,
-                     rowHeights=row_heights,
-                     style=TSTYLES['ElementLine'],
-                     hAlign='LEFT')
+        ref_link = f'{self.measure.link}/#references_list'
+        return SummaryParagraph(lines, ref_link)
 
     def gen_embedded_value_table(self, api_name: str) -> Table | None:
         data = self.measure.get_table_data(api_name)
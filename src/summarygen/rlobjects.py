@@ -10,10 +10,13 @@ from src.summarygen.styling import INNER_WIDTH, INNER_HEIGHT
 class ElementLine:
     def __init__(self,
                  elements: list[ParagraphElement] | None=None,
-                 max_width: float | None=INNER_WIDTH):
+                 max_width: float | None=INNER_WIDTH,
+                 widths: list[float] | None=None):
         self.elements: list[ParagraphElement] = elements or []
         self.max_width = max_width
-        self.widths: list[float] = [elem.width for elem in self.elements]
+        if widths is None:
+            widths = [elem.width for elem in self.elements]
+        self.widths: list[float] = widths
         self.heights: list[float] = [elem.height for elem in self.elements]
         if self.max_width != None and self.width > self.max_width:
             raise WidthExceededError(f'Max width of {self.max_width} exceeded')
@@ -46,8 +49,9 @@ class ElementLine:
         return result
 
     def __add(self, element: ParagraphElement):
+        width = element.width
         if (self.max_width != None
-                and element.width + self.width > self.max_width):
+                and width + self.width > self.max_width):
             raise WidthExceededError(f'Max width of {self.max_width} exceeded')
 
         try:
@@ -55,7 +59,7 @@ class ElementLine:
         except (IndexError, ElementJoinError):
             self.elements.append(element)
 
-        self.widths.append(element.width)
+        self.widths.append(width)
         self.heights.append(element.height)
 
     def add(self, element: ParagraphElement):
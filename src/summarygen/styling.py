@@ -10,6 +10,7 @@ from reportlab.pdfbase.pdfmetrics import registerFontFamily
 from reportlab.platypus import TableStyle
 
 from src import asset_path
+from src.summarygen.metrics import register_advances
 
 
 _U = TypeVar('_U')
@@ -56,10 +57,13 @@ class Font:
             os.path.join(self.path, f'{name}-BoldItalic.ttf'))
 
     def register(self):
-        pdfmetrics.registerFont(self.regular)
-        pdfmetrics.registerFont(self.bold)
-        pdfmetrics.registerFont(self.italic)
-        pdfmetrics.registerFont(self.bold_italic)
+        """Registers all font styles, along with their glyph advances
+        (see `metrics.register_advances()`).
+        """
+
+        for font in (self.regular, self.bold, self.italic, self.bold_italic):
+            pdfmetrics.registerFont(font)
+            register_advances(font)
         registerFontFamily(self.name,
                            normal=self.name,
                            bold=f'{self.name}B',
@@ -454,16 +458,12 @@ def value_table_style(data: list[list | tuple],
             ('FONTNAME', (0, 0), (0, -1), 'ArialB'),
             ('FONTNAME', (1, 0), (-1, -1), 'Arial')])
 
-    for i in range(1, len(data)):
-        if i % 2 == switch:
-            table_styles.append(('BACKGROUND',
-                                (0, i),
-                                (-1, i),
-                                COLORS['ValueTableItemLight']))
-        else:
-            table_styles.append(('BACKGROUND',
-                                 (0, i),
-                                 (-1, i), COLORS['ValueTableItemDark']))
+    # one command for all rows, per-row commands are copied each time
+    # the table splits
+    row_colors = [COLORS['ValueTableItemLight'], COLORS['ValueTableItemDark']]
+    if switch == 0:
+        row_colors.reverse()
+    table_styles.append(('ROWBACKGROUNDS', (0, 1), (-1, -1), row_colors))
     
     # TODO: add different colors for determinants and columns
 
@@ -3,7 +3,6 @@ import re
 import shutil
 from reportlab.lib.pagesizes import inch
 from reportlab.pdfgen.canvas import Canvas
-from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.platypus import (
     Table,
     Paragraph,
@@ -31,6 +30,7 @@ from src.summarygen.styling import (
     INNER_WIDTH
 )
 from src.summarygen.flowables import NEWLINE
+from src.summarygen.metrics import string_width
 from src.summarygen.rlobjects import Story
 
 
@@ -115,9 +115,9 @@ def calc_row_heights(data: list[list[str | Paragraph]],
             re_match = re.search(r'<link .+>(.+)</link>', text)
             if re_match != None:
                 text = str(re_match.group(1))
-            width = stringWidth(text,
-                                row_styles[i].font_name,
-                                row_styles[i].font_size)
+            width = string_width(text,
+                                 row_styles[i].font_name,
+                                 row_styles[i].font_size)
             scale = width // (base_widths[i])
             leading = row_styles[i].leading
             cell_height = height + scale * leading
@@ -165,7 +165,9 @@ class MeasureSummary:
                                          pstyle)],
             ['End Date', Paragraph(measure.sunset_date or '',
                                    pstyle)],
-            ['PA Lead', Paragraph(measure.pa_lead, pstyle)]
+            ['PA Lead', Paragraph(measure.pa_lead, pstyle)],
+            ['Permutations', Paragraph(f'{measure.count_permutations():,}',
+                                       pstyle)]
         ]
         style = TSTYLES['DetailsTable']
         col_widths = (2.25*inch, 3.03*inch)
@@ -345,6 +347,20 @@ class MeasureSummary:
         self.add_sections_table(measure)
         self.story.add(PageBreak())
 
+    def add_measures(self, measures: list[Measure]):
+        reference_codes: list[str] = []
+        for measure in measures:
+            permutation_ref = lookups.PERMUTATION_REFS.get(
+                measure.use_category)
+            if permutation_ref != None:
+                reference_codes.append(permutation_ref)
+            reference_codes.extend(measure.get_reference_codes())
+        self.connection.prefetch_references(
+            list(dict.fromkeys(reference_codes)))
+
+        for measure in measures:
+            self.add_measure(measure)
+
     def reset(self):
         self.story.clear()
 
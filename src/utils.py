@@ -1,7 +1,17 @@
+import sys
 import PIL.Image as Image
 import customtkinter as ctk
-from typing import Type, TypeVar, overload, NewType, get_args, get_origin, Any
-from types import UnionType, NoneType
+from typing import (
+    Type,
+    TypeVar,
+    overload,
+    NewType,
+    get_args,
+    get_origin,
+    Any,
+    Callable
+)
+from types import UnionType, NoneType, GenericAlias
 
 from src import asset_path
 
@@ -129,6 +139,153 @@ def getc(o: dict,
         raise TypeError(f'unsupported type: {_origin}')
 
 
+def istr(o: Any) -> str:
+    """Casts `o` to an interned `str`.
+
+    Use as a type for strings that are repeated across many objects
+    (e.g., API names and units) so that only one copy is kept in memory.
+    """
+
+    return sys.intern(str(o))
+
+
+def _constructor(_type: Any) -> Callable[[Any], Any]:
+    """Returns the constructor that calling `_type` resolves to.
+
+    Calling a generic alias (e.g., `list[str | None]`) only calls its
+    origin, so the origin is returned to skip the alias overhead.
+    """
+
+    _origin = get_origin(_type)
+    if isinstance(_type, GenericAlias) and isinstance(_origin, type):
+        return _origin
+    return _type
+
+
+def compile_caster(name: str, _type: Type[_T]) -> Callable[[Any], _T]:
+    """Compiles a function that casts an attribute named `name` to
+    `_type` the same way that `getc()` does.
+
+    All type reflection is done once, up front.
+    """
+
+    _types = get_args(_type)
+    _origin = get_origin(_type)
+
+    if _origin is None:
+        def cast(attr: Any) -> _T:
+            try:
+                return _type(attr)
+            except:
+                raise TypeError(f'cannot cast attribute to type {_type}')
+    elif _origin is list:
+        if len(_types) > 1:
+            def cast(attr: Any) -> _T:
+                if not isinstance(attr, list):
+                    raise TypeError(f'field {name} does not map to a list')
+
+                if len(attr) != len(_types):
+                    raise TypeError(f'incompatible lists')
+                results = []
+                for i, list_type in enumerate(_types):
+                    try:
+                        results.append(list_type(attr[i]))
+                    except:
+                        raise TypeError('incompatible types:'
+                                        f' {type(attr[i])} != {list_type}')
+                return results
+        else:
+            list_type = _types[0]
+            construct = _constructor(list_type)
+
+            def cast(attr: Any) -> _T:
+                if not isinstance(attr, list):
+                    raise TypeError(f'field {name} does not map to a list')
+
+                try:
+                    return list(map(construct, attr))
+                except:
+                    raise TypeError(f'list item {attr} cannot cast to'
+                                    f' {list_type}')
+    elif _origin is dict:
+        args_len = len(_types)
+        if args_len >= 3:
+            raise TypeError(f'unsupported dict type: {_type}')
+
+        key_type = _types[0]
+        val_type = Any if args_len < 2 else _types[1]
+
+        def cast(attr: Any) -> _T:
+            if not isinstance(attr, dict):
+                raise TypeError(f'field {name} does not map to a dict')
+
+            for _key, _val in attr.items():
+                try:
+                    key_type(_key)
+                except:
+                    raise TypeError(f'type {type(_key)} is not compatible'
+                                    f' with key type {key_type}')
+                if args_len == 2:
+                    try:
+                        val_type(_val)
+                    except:
+                        raise TypeError(f'type {type(_val)} is not'
+                                        ' compatible with val type'
+                                        f' {val_type}')
+            return attr
+    elif _origin is UnionType:
+        nullable = NoneType in _types
+
+        def cast(attr: Any) -> _T:
+            if nullable and attr == None:
+                return None
+
+            for union_type in _types:
+                try:
+                    return union_type(attr)
+                except:
+                    continue
+            raise TypeError(f'cannot cast attribute of type {type(attr)}'
+                            f' to {_type}')
+    else:
+        raise TypeError(f'unsupported type: {_origin}')
+
+    return cast
+
+
+def compile_getc(name: str, _type: Type[_T]) -> Callable[[dict], _T]:
+    """Compiles `getc(o, name, _type)` into a function of `o`."""
+
+    cast = compile_caster(name, _type)
+
+    def _getc(o: dict) -> _T:
+        return cast(o.get(name))
+
+    return _getc
+
+
+def compile_decoder(fields: dict[str, Any]) -> Callable[[Any, dict], None]:
+    """Compiles a decoder for the field spec `fields`, a mapping of
+    attribute names to types.
+
+    The decoder is called with an object and a dict, and sets each
+    attribute of the object to the dict attribute of the same name, cast
+    the same way that `getc()` does. Intended to be compiled once per
+    class and stored as a method.
+    """
+
+    namespace: dict[str, Any] = {}
+    lines = ['def decode(self, o):', '    get = o.get']
+    for i, (name, _type) in enumerate(fields.items()):
+        if not name.isidentifier():
+            raise ValueError(f'invalid field name: {name}')
+
+        namespace[f'_cast{i}'] = compile_caster(name, _type)
+        lines.append(f'    self.{name} = _cast{i}(get({name!r}))')
+    exec('\n'.join(lines), namespace)
+    return namespace['decode']
+
+
 def get_tkimage(light_image: str,
                 dark_image: str | None=None,
                 size: tuple[int, int]=(20, 20)
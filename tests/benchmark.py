@@ -0,0 +1,490 @@
+import io
+import sys
+import json
+import random
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Flowable, Paragraph, Table
+
+from context import etrm, utils, metrics, parser, flowables, styling
+
+
+LABEL_FIELDS = {
+    'name': str,
+    'api_name': str,
+    'active': str,
+    'description': str
+}
+
+VALUE_TABLE_FIELDS = {
+    'name': str,
+    'api_name': str,
+    'type': str,
+    'description': str,
+    'order': int,
+    'determinants': list[str],
+    'values': list[list[str | None]],
+    'reference_refs': list[str]
+}
+
+
+def fixture_measure(determinant_count: int=40,
+                    label_count: int=60,
+                    table_count: int=30,
+                    row_count: int=400
+                   ) -> dict[str, Any]:
+    """Returns a synthetic measure JSON object, large enough to make
+    decoding costs measurable.
+
+    The object is round-tripped through `json` so that, like an API
+    response, repeated strings are separate objects.
+    """
+
+    determinants = [
+        {
+            'name': f'Determinant {i}',
+            'api_name': f'Det{i}',
+            'labels': [
+                {
+                    'name': f'Label {i}.{j}',
+                    'api_name': f'Lbl{i}_{j}',
+                    'active': 'Yes',
+                    'description': f'Description of label {i}.{j}'
+                } for j in range(label_count)],
+            'description': f'Description of determinant {i}',
+            'order': i,
+            'reference_refs': [f'R{i}']
+        } for i in range(determinant_count)]
+
+    value_tables = [
+        {
+            'name': f'Value Table {i}',
+            'api_name': f'VT{i}',
+            'type': 'value',
+            'description': f'Description of value table {i}',
+            'order': i,
+            'determinants': ['Det0', 'Det1', 'Det2'],
+            'columns': [
+                {
+                    'name': f'Column {j}',
+                    'api_name': f'col{j}',
+                    'unit': 'kWh',
+                    'reference_refs': []
+                } for j in range(4)],
+            'values': [
+                [f'Lbl0_{j % label_count}',
+                    f'Lbl1_{j % 7}',
+                    f'Lbl2_{j % 3}',
+                    str(j * 0.5),
+                    None,
+                    str(j),
+                    str(j * 2)]
+                for j in range(row_count)],
+            'reference_refs': [f'R{i}']
+        } for i in range(table_count)]
+
+    measure: dict[str, Any] = {
+        'statewide_measure_id': 'SWBM001',
+        'is_published': True,
+        'name': 'Benchmark Measure',
+        'use_category': 'AP',
+        'status': 'Published',
+        'effective_start_date': '2024-01-01',
+        'sunset_date': None,
+        'pa_lead': 'PGE',
+        'permutation_method': 1,
+        'workpaper_cover_sheet': '',
+        'characterization_source_file': None,
+        'determinants': determinants,
+        'shared_determinant_refs': [],
+        'shared_lookup_refs': [],
+        'value_tables': value_tables,
+        'calculations': [],
+        'exclusion_tables': [],
+        'full_version_id': 'SWBM001-01',
+        'date_committed': '2024-01-01T00:00:00Z',
+        'change_description': '',
+        'owner': '',
+        'permutations_url': '',
+        'property_data_url': ''
+    }
+    for name in etrm.models.Measure._Measure__characterization_names:
+        measure[name] = f'<p>{name}</p>'
+    return json.loads(json.dumps(measure))
+
+
+def timeit(func: Callable[[], Any], repeat: int=5) -> float:
+    """Returns the best time (in seconds) of `repeat` calls to `func`."""
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def decode_measure(measure_json: dict[str, Any],
+                   values: bool=False
+                  ) -> etrm.models.Measure:
+    measure = etrm.models.Measure(measure_json)
+    measure.determinants
+    measure.value_tables
+    measure.calculations
+    measure.exclusion_tables
+    if values:
+        for table in measure.value_tables:
+            table.data
+        for calculation in measure.calculations:
+            calculation.data
+    return measure
+
+
+def report(name: str,
+           base_time: float,
+           fast_time: float,
+           labels: tuple[str, str]=('getc', 'compiled')):
+    base_label, fast_label = labels
+    print(f'{name}: {base_label} {base_time * 1000:.2f}ms, {fast_label}'
+          f' {fast_time * 1000:.2f}ms'
+          f' ({base_time / fast_time:.1f}x)',
+          file=sys.stderr)
+
+
+def benchmark_decoders():
+    measure_json = fixture_measure()
+    labels = [label
+                for determinant
+                in measure_json['determinants']
+                for label
+                in determinant['labels']]
+    tables = measure_json['value_tables']
+
+    class Decoded:
+        pass
+
+    decode_label = utils.compile_decoder(LABEL_FIELDS)
+    decode_table = utils.compile_decoder(VALUE_TABLE_FIELDS)
+
+    def getc_decode(objects: list[dict], fields: dict[str, Any]):
+        for obj in objects:
+            decoded = Decoded()
+            for name, _type in fields.items():
+                setattr(decoded, name, utils.getc(obj, name, _type))
+
+    def compiled_decode(objects: list[dict], decode: Callable):
+        for obj in objects:
+            decode(Decoded(), obj)
+
+    report(f'{len(labels)} labels',
+           timeit(lambda: getc_decode(labels, LABEL_FIELDS)),
+           timeit(lambda: compiled_decode(labels, decode_label)))
+    report(f'{len(tables)} value tables',
+           timeit(lambda: getc_decode(tables, VALUE_TABLE_FIELDS)),
+           timeit(lambda: compiled_decode(tables, decode_table)))
+
+    measure_time = timeit(lambda: decode_measure(measure_json))
+    print(f'full measure decode: {measure_time * 1000:.2f}ms',
+          file=sys.stderr)
+
+
+def benchmark_tables():
+    measure_json = fixture_measure()
+    table_names = [table['api_name']
+                    for table
+                    in measure_json['value_tables']]
+
+    def export():
+        measure = decode_measure(measure_json)
+        for name in table_names:
+            measure.get_table_data(name)
+
+    export_time = timeit(export)
+    print(f'{len(table_names)} value table exports (cold):'
+          f' {export_time * 1000:.2f}ms',
+          file=sys.stderr)
+
+    measure = decode_measure(measure_json, values=True)
+    table = measure.value_tables[0]
+    column_time = timeit(lambda: table.data.numeric(table.data.key_count))
+    print(f'numeric column ({len(table.data)} rows):'
+          f' {column_time * 1000:.3f}ms',
+          file=sys.stderr)
+
+    rows = table.data.rows()
+    keys = [tuple(row[:table.data.key_count]) for row in rows]
+
+    def scan_lookups():
+        for key in keys:
+            for row in rows:
+                if tuple(row[:len(key)]) == key:
+                    break
+
+    def indexed_lookups():
+        for key in keys:
+            table.lookup(*key)
+
+    report(f'{len(keys)} row lookups',
+           timeit(scan_lookups),
+           timeit(indexed_lookups),
+           labels=('scan', 'indexed'))
+
+
+def benchmark_json():
+    """Reports the time to decode a measure response body with each
+    installed JSON decoder.
+    """
+
+    payload = json.dumps(fixture_measure()).encode()
+    print(f'measure payload: {len(payload) / 1024:.1f}KiB', file=sys.stderr)
+
+    base_time = timeit(lambda: json.loads(payload))
+    for name, loads in etrm.decoding.DECODERS.items():
+        if name != 'json':
+            report(f'{name} decode',
+                   base_time,
+                   timeit(lambda: loads(payload)),
+                   labels=('json', name))
+
+
+def benchmark_text_widths(cell_count: int=5000):
+    """Reports the time to measure a value table column and a long
+    paragraph with `stringWidth()` and with glyph advances.
+    """
+
+    font_name = 'SourceSansPro'
+    texts = [f'{i * 0.37:.4f} kWh/unit {i}' for i in range(cell_count)]
+    report(f'{cell_count} cell column',
+           timeit(lambda: max(stringWidth(text, font_name, 9)
+                                for text
+                                in texts)),
+           timeit(lambda: metrics.string_widths(texts, font_name, 9).max()),
+           labels=('stringWidth', 'advances'))
+
+    paragraph = ' '.join(texts)
+    advances = metrics.FONT_ADVANCES[font_name]
+    report(f'{len(paragraph)} character paragraph',
+           timeit(lambda: stringWidth(paragraph, font_name, 9)),
+           timeit(lambda: advances.width(paragraph, 9)),
+           labels=('stringWidth', 'advances'))
+
+
+def fixture_star_space(leaf_count: int,
+                       label_count: int
+                      ) -> etrm.permutations.PermutationSpace:
+    """Returns a permutation space of `leaf_count` dimensions that each
+    exclude label pairs with a last, shared dimension.
+    """
+
+    leaves = [(f'Leaf{i}', [f'Lbl{i}_{j}' for j in range(label_count)])
+                for i in range(leaf_count)]
+    hub = ('Hub', [f'Hub_{j}' for j in range(label_count)])
+    exclusions = [
+        (name,
+            'Hub',
+            {(labels[j], hub[1][(i + j) % label_count])
+                for j
+                in range(label_count)})
+        for i, (name, labels) in enumerate(leaves)]
+    return etrm.permutations.PermutationSpace(leaves + [hub], exclusions)
+
+
+def benchmark_star_exclusions(leaf_count: int=20, label_count: int=10):
+    """Reports the time to count the permutations of spaces with a star
+    of exclusions, by enumeration and by `count()`.
+    """
+
+    space = fixture_star_space(4, label_count)
+    report('4-exclusion star count',
+           timeit(lambda: sum(1 for _ in space)),
+           timeit(space.count),
+           labels=('enumerate', 'count'))
+
+    space = fixture_star_space(leaf_count, label_count)
+    count_time = timeit(space.count)
+    print(f'{leaf_count}-exclusion star count ({space.count()}'
+          f' permutations): {count_time * 1000:.2f}ms',
+          file=sys.stderr)
+
+
+def fixture_summary(word_count: int=20000) -> str:
+    """Returns a synthetic technology summary paragraph with bold,
+    italic, subscript and superscript runs and over-long words.
+    """
+
+    words = ('the measure replaces existing equipment with high efficiency'
+             ' units reducing annual energy consumption kWh therms'
+             ' baseline').split()
+    rng = random.Random(0)
+    html_words: list[str] = []
+    for i in range(word_count):
+        match i % 17:
+            case 3:
+                word = f'<strong>{rng.choice(words)}</strong>'
+            case 7:
+                word = f'<em>{rng.choice(words)}</em>'
+            case 11:
+                word = 'CO<sub>2</sub>'
+            case 13:
+                word = 'ft<sup>2</sup>'
+            case _:
+                word = rng.choice(words)
+        if i % 997 == 0:
+            word = 'x' * 120
+        html_words.append(word)
+    return f'<p>{" ".join(html_words)}</p>'
+
+
+def benchmark_line_breaking():
+    """Reports the time to break a long technology summary into lines,
+    with the width cache cleared.
+    """
+
+    soup = parser.BeautifulSoup(fixture_summary(), 'html.parser')
+    elements = parser._parse_element(soup.find('p'))
+
+    def wrap() -> list:
+        metrics.WIDTH_CACHE.clear()
+        return parser.wrap_elements(elements)
+
+    wrap_time = timeit(wrap)
+    print(f'{len(elements)} element summary: {len(wrap())} lines in'
+          f' {wrap_time * 1000:.2f}ms',
+          file=sys.stderr)
+
+
+def layout(flowable: Flowable) -> int:
+    """Wraps, splits and draws `flowable` onto as many pages as it
+    needs, returns the page count.
+    """
+
+    canvas = Canvas(io.BytesIO())
+    width, height = styling.INNER_WIDTH, styling.INNER_HEIGHT
+    pending = [flowable]
+    page_count = 0
+    while pending != []:
+        flowable = pending.pop(0)
+        _, flowable_height = flowable.wrap(width, height)
+        if flowable_height > height:
+            pending[:0] = flowable.split(width, height)
+            continue
+        flowable.drawOn(canvas, styling.X_MARGIN, styling.Y_MARGIN)
+        canvas.showPage()
+        page_count += 1
+    return page_count
+
+
+def benchmark_paragraph_layout(word_count: int=5000):
+    """Reports the time to lay out a long technology summary as a table
+    of one table of paragraphs per line, and as a paragraph drawn
+    directly onto the canvas.
+    """
+
+    soup = parser.BeautifulSoup(fixture_summary(word_count), 'html.parser')
+    lines = parser.wrap_elements(parser._parse_element(soup.find('p')))
+    leading = styling.DEF_PSTYLE.leading
+    line_style = styling.TSTYLES['ElementLine']
+
+    def table_paragraph() -> Table:
+        rows = [[Table([[Paragraph(element.text_xml, style=element.style)
+                            for element
+                            in line.elements]],
+                       colWidths=line.widths,
+                       rowHeights=[leading],
+                       style=line_style)]
+                    for line
+                    in lines]
+        return Table(rows,
+                     colWidths=[styling.INNER_WIDTH],
+                     rowHeights=[leading] * len(rows),
+                     style=line_style)
+
+    def summary_paragraph() -> flowables.SummaryParagraph:
+        return flowables.SummaryParagraph(lines, '#references_list')
+
+    report(f'{len(lines)} line summary layout',
+           timeit(lambda: layout(table_paragraph()), repeat=1),
+           timeit(lambda: layout(summary_paragraph())),
+           labels=('tables', 'direct'))
+
+
+def fixture_table(row_count: int) -> str:
+    """Returns a synthetic HTML value table with styled cells and cells
+    that wrap onto several lines.
+    """
+
+    rows = ''.join(f'<tr><td>{i} <strong>kWh</strong> CO<sub>2</sub></td>'
+                   f'<td>{"annual energy savings " * (i % 7)}</td>'
+                   f'<td>{"x" * (i % 90)}</td></tr>'
+                        for i
+                        in range(row_count))
+    return ('<table><thead><tr><th>Measure</th><th>Description</th>'
+            f'<th>Value</th></tr></thead><tbody>{rows}</tbody></table>')
+
+
+def benchmark_table_layout(row_counts: tuple[int, ...]=(100, 500, 2000)):
+    """Reports the time per row to parse and lay out HTML value tables
+    of increasing size.
+    """
+
+    for row_count in row_counts:
+        soup = parser.BeautifulSoup(fixture_table(row_count), 'html.parser')
+
+        def parse_table() -> Table:
+            data = parser.parse_table(soup.find('table'))
+            style = styling.value_table_style(data, embedded=True)
+            return Table(data,
+                         colWidths=parser.calc_col_widths(data, style),
+                         rowHeights=parser.calc_row_heights(data, style),
+                         style=style,
+                         hAlign='LEFT')
+
+        parse_time = timeit(parse_table, repeat=3)
+        table = parse_table()
+        layout_time = timeit(lambda: layout(table), repeat=3)
+        print(f'{row_count} row table: parse'
+              f' {parse_time / row_count * 1000:.3f}ms/row, layout'
+              f' {layout_time / row_count * 1000:.3f}ms/row',
+              file=sys.stderr)
+
+
+def benchmark_memory(measure_count: int=10):
+    """Reports the memory held by decoded measures, excluding the
+    response JSON that each measure keeps.
+    """
+
+    measure_jsons = [fixture_measure() for _ in range(measure_count)]
+    for values in (False, True):
+        tracemalloc.start()
+        start_size, _ = tracemalloc.get_traced_memory()
+        measures = [decode_measure(measure_json, values)
+                        for measure_json
+                        in measure_jsons]
+        end_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        per_measure = (end_size - start_size) / len(measures)
+        state = 'with' if values else 'without'
+        print(f'memory per cached measure ({state} table values):'
+              f' {per_measure / 1024:.1f}KiB',
+              file=sys.stderr)
+
+
+def main():
+    benchmark_decoders()
+    benchmark_json()
+    benchmark_tables()
+    benchmark_star_exclusions()
+    benchmark_text_widths()
+    benchmark_line_breaking()
+    benchmark_paragraph_layout()
+    benchmark_table_layout()
+    benchmark_memory()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 import src.etrm as etrm
 import src.summarygen.summary as summary
+import src.summarygen.models as models
+import src.summarygen.metrics as metrics
+import src.summarygen.parser as parser
+import src.summarygen.flowables as flowables
+import src.summarygen.styling as styling
 import src.app as app
 import src.main as main
 import src.resources as resources
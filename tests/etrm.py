@@ -0,0 +1,269 @@
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from context import etrm
+
+
+def _ids(start: int, stop: int, prefix: str='SWAP') -> list[str]:
+    return [f'{prefix}{i:03d}' for i in range(start, stop)]
+
+
+def test_id_index():
+    id_index = etrm.cache.IDIndex()
+    assert id_index.get(0, 5) is None
+    assert id_index.missing(0, 5) == [(0, 5)]
+
+    id_index.add(0, _ids(0, 5))
+    id_index.add(10, _ids(10, 15))
+    assert len(id_index) == 10
+    assert id_index.get(0, 5) == _ids(0, 5)
+    assert id_index.get(11, 3) == _ids(11, 14)
+    assert id_index.get(3, 5) is None
+    assert id_index.missing(0, 20) == [(5, 5), (15, 5)]
+    assert id_index.missing(2, 10) == [(5, 5)]
+    print('Passed disjoint IDIndex tests', file=sys.stderr)
+
+    # adjacent on both sides, merges all three ranges
+    id_index.add(5, _ids(5, 10))
+    assert len(id_index) == 15
+    assert id_index.get(0, 15) == _ids(0, 15)
+    assert id_index.missing(0, 15) == []
+    assert id_index.missing(0, 20) == [(15, 5)]
+    print('Passed adjacent IDIndex tests', file=sys.stderr)
+
+    # overlapping, newer IDs replace older ones
+    id_index.add(3, _ids(3, 6, 'SWHC'))
+    assert len(id_index) == 15
+    assert id_index.get(0, 8) == (_ids(0, 3)
+                                  + _ids(3, 6, 'SWHC')
+                                  + _ids(6, 8))
+
+    # overlapping several ranges and extending past the last one
+    id_index = etrm.cache.IDIndex()
+    id_index.add(0, _ids(0, 3))
+    id_index.add(5, _ids(5, 8))
+    id_index.add(10, _ids(10, 13))
+    id_index.add(2, _ids(2, 11, 'SWLG'))
+    assert len(id_index) == 13
+    assert id_index.get(0, 13) == (_ids(0, 2)
+                                   + _ids(2, 11, 'SWLG')
+                                   + _ids(11, 13))
+    assert id_index.missing(0, 13) == []
+
+    # overlapping the start of a range
+    id_index.add(20, _ids(20, 25))
+    id_index.add(17, _ids(17, 22, 'SWWH'))
+    assert id_index.get(17, 8) == _ids(17, 22, 'SWWH') + _ids(22, 25)
+    assert id_index.missing(0, 30) == [(13, 4), (25, 5)]
+    print('Passed overlapping IDIndex tests', file=sys.stderr)
+
+    # windows are truncated to the total count
+    id_index.count = 27
+    assert id_index.missing(20, 10) == [(25, 2)]
+    id_index.add(25, _ids(25, 27))
+    assert id_index.get(24, 10) == _ids(24, 27)
+    assert id_index.get(30, 5) == []
+    assert id_index.missing(20, 10) == []
+    print('Passed counted IDIndex tests', file=sys.stderr)
+
+
+def test_missing_ids():
+    cache = etrm.ETRMCache()
+    assert cache.get_ids(0, 10) is None
+    assert cache.missing_ids(0, 10) == [(0, 10)]
+
+    cache.add_ids(_ids(0, 5), 0, 5, 30)
+    cache.add_ids(_ids(10, 15), 10, 5, 30)
+    assert cache.get_ids(0, 5) == (_ids(0, 5), 30)
+    assert cache.get_ids(0, 10) is None
+    assert cache.missing_ids(0, 20) == [(5, 5), (15, 5)]
+    assert cache.missing_ids(0, 40) == [(5, 5), (15, 15)]
+
+    cache.add_ids(_ids(5, 10), 5, 5, 30)
+    assert cache.get_ids(0, 15) == (_ids(0, 15), 30)
+    assert cache.missing_ids(0, 15) == []
+    assert cache.missing_ids(12, 10) == [(15, 7)]
+
+    # use categories are cached separately
+    assert cache.missing_ids(0, 5, 'HC') == [(0, 5)]
+    cache.add_ids(_ids(0, 5, 'SWHC'), 0, 5, 5, 'HC')
+    assert cache.missing_ids(0, 10, 'HC') == []
+    assert cache.get_ids(0, 10, 'HC') == (_ids(0, 5, 'SWHC'), 5)
+    assert cache.get_ids(0, 5) == (_ids(0, 5), 30)
+    print('Passed missing_ids tests', file=sys.stderr)
+
+
+def test_columnar_values():
+    columns = [
+        # keys
+        ['A', 'A', 'B', None, 'B', 'C', 'C', 'A'],
+        ['x', 'y', 'x', 'y', None, 'x', 'y', 'z'],
+        # integers
+        ['1', '12', '-3', '0', None, '1000000', '7', '42'],
+        # floats
+        ['1.5', '2.0', '-0.25', None, '0.1', '3.0', '1e-05', '100.0'],
+        # trailing zeros
+        ['0.10', '1.5', '2.50', '3.25', None, '4.0', '5.125', '6.5'],
+        # exponents
+        ['1e-05', '2.5e+20', '1E5', '-1e-07', '3.0', None, '1.5e-10', '0.5'],
+        # mixed integers and floats
+        ['1', '2.5', '3', '4.75', '5', '6', '7.125', None],
+        # text
+        ['abc', '1', None, 'n/a', '2.5', 'x', 'y', 'z'],
+        # all null
+        [None] * 8
+    ]
+    rows = [list(row) for row in zip(*columns)]
+    data = etrm.columnar.ColumnarValues(rows, 2)
+    assert data.shape == (8, len(columns))
+    assert data.rows() == rows
+    assert data.rows(null='') == [['' if cell is None else cell
+                                        for cell
+                                        in row]
+                                    for row
+                                    in rows]
+    for i, column in enumerate(columns):
+        assert data.column(i).tolist() == [cell or '' for cell in column]
+        assert data.null_mask(i).tolist() == [cell is None for cell in column]
+    print('Passed columnar round-trip tests', file=sys.stderr)
+
+    for i in range(data.key_count, 7):
+        numbers = data.numeric(i)
+        assert numbers.dtype == np.float64
+        assert numbers is data.numeric(i)
+        expected = [np.nan if cell is None else float(cell)
+                        for cell
+                        in columns[i]]
+        assert np.array_equal(numbers, expected, equal_nan=True)
+    assert np.isnan(data.numeric(7)).tolist() == [True, False, True, True,
+                                                  False, True, True, True]
+    assert np.isnan(data.numeric(8)).all()
+    print('Passed columnar numeric tests', file=sys.stderr)
+
+    row = data.row_index.get(('C', 'y'))
+    assert row != None
+    assert row.index == 6
+    assert row.values == tuple(rows[6][2:])
+    assert np.array_equal(row.numbers,
+                          [7.0, 1e-05, 5.125, 1.5e-10, 7.125,
+                           np.nan, np.nan],
+                          equal_nan=True)
+    mask = data.key_mask(0, 'A')
+    assert data.rows(mask) == [rows[0], rows[1], rows[7]]
+    print('Passed columnar lookup tests', file=sys.stderr)
+
+
+class _FileAdapter(requests.adapters.BaseAdapter):
+    """Serves `content` with the ETag `etag`, honoring range requests
+    whose `If-Range` validator matches.
+    """
+
+    def __init__(self, content: bytes, etag: str):
+        super().__init__()
+        self.content = content
+        self.etag = etag
+        self.requests: list[requests.PreparedRequest] = []
+
+    def send(self, request: requests.PreparedRequest, **kwargs):
+        self.requests.append(request)
+        status = 200
+        body = self.content
+        headers = {'ETag': self.etag}
+        range_header = request.headers.get('Range', None)
+        if (range_header != None
+                and request.headers.get('If-Range', None) == self.etag):
+            offset = int(range_header[len('bytes='):-1])
+            if offset >= len(self.content):
+                status = 416
+                body = b''
+            else:
+                status = 206
+                body = self.content[offset:]
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def test_download():
+    url = 'https://files.test/export.csv'
+    content = b''.join(b'%d,label %d\r\n' % (i, i) for i in range(1000))
+    connection = etrm.ETRMConnection('Token test')
+    adapter = _FileAdapter(content, '"v1"')
+    connection.session.mount('https://files.test/', adapter)
+
+    with tempfile.TemporaryDirectory() as dir_path:
+        path = os.path.join(dir_path, 'export.csv')
+        part_path = f'{path}.part'
+        validator_path = f'{part_path}.validator'
+
+        def write_part(part: bytes, validator: str):
+            with open(part_path, 'wb') as part_file:
+                part_file.write(part)
+            with open(validator_path, 'w') as validator_file:
+                validator_file.write(validator)
+
+        def downloaded() -> bytes:
+            assert not os.path.exists(part_path)
+            assert not os.path.exists(validator_path)
+            with open(path, 'rb') as file:
+                return file.read()
+
+        assert connection.download(url, path, chunk_size=256) == path
+        assert downloaded() == content
+        assert 'Range' not in adapter.requests[-1].headers
+        print('Passed download tests', file=sys.stderr)
+
+        write_part(content[:1234], '"v1"')
+        adapter.requests.clear()
+        connection.download(url, path, chunk_size=256)
+        assert downloaded() == content
+        assert len(adapter.requests) == 1
+        assert adapter.requests[0].headers['Range'] == 'bytes=1234-'
+        assert adapter.requests[0].headers['If-Range'] == '"v1"'
+        print('Passed resumed download tests', file=sys.stderr)
+
+        # the file changed, the server sends all of it
+        write_part(b'x' * 1234, '"v0"')
+        adapter.requests.clear()
+        connection.download(url, path, chunk_size=256)
+        assert downloaded() == content
+        assert len(adapter.requests) == 1
+        assert adapter.requests[0].headers['If-Range'] == '"v0"'
+        print('Passed changed download tests', file=sys.stderr)
+
+        # the partial file is longer than the file
+        write_part(content + b'x', '"v1"')
+        adapter.requests.clear()
+        connection.download(url, path, chunk_size=256)
+        assert downloaded() == content
+        assert len(adapter.requests) == 2
+        assert 'Range' in adapter.requests[0].headers
+        assert 'Range' not in adapter.requests[1].headers
+        print('Passed unsatisfiable range download tests', file=sys.stderr)
+
+    connection.close()
+
+
+def main():
+    test_id_index()
+    test_missing_ids()
+    test_columnar_values()
+    test_download()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,12 +4,18 @@ import argparse as ap
 
 import measurepdf
 import utils
+import etrm
+import summarygen
+import benchmark
 
 
-MODULES = ['measurepdf', 'utils', 'etrm']
+MODULES = ['measurepdf', 'utils', 'etrm', 'summarygen', 'benchmark']
 UNIT_TEST = {
     'measurepdf': measurepdf.test,
-    'utils': utils.main
+    'utils': utils.main,
+    'etrm': etrm.main,
+    'summarygen': summarygen.main,
+    'benchmark': benchmark.main
 }
 
 
@@ -16,8 +16,13 @@ def build_summary(measure_ids: list[str]):
     measure_pdf = summary.MeasureSummary(dir_path, connection)
     print('measure pdf object created', file=sys.stderr)
 
-    for measure_id in measure_ids:
-        measure_pdf.add_measure(connection.get_measure(measure_id))
+    measures = connection.get_measures(measure_ids)
+    for measure_id, measure in zip(measure_ids, measures):
+        if isinstance(measure, Exception):
+            print(f'could not retrieve measure {measure_id}: {measure}',
+                  file=sys.stderr)
+            continue
+        measure_pdf.add_measure(measure)
         print(f'added measure {measure_id}', file=sys.stderr)
 
     measure_pdf.build()
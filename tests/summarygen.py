@@ -0,0 +1,83 @@
+import sys
+
+from context import models, parser
+
+
+FONT = ('Helvetica', 10)
+
+
+def _text(text: str) -> models.ParagraphElement:
+    return models.ParagraphElement(text)
+
+
+def _ref(text: str) -> models.ParagraphElement:
+    return models.ParagraphElement(text,
+                                   models.ElemType.REF,
+                                   [models.TextStyle.STRONG])
+
+
+def _wrap(elements: list[models.ParagraphElement],
+          max_width: float=500
+         ) -> list[str]:
+    lines = parser.wrap_elements(elements,
+                                 max_width=max_width,
+                                 font=lambda element: FONT)
+    for line in lines:
+        assert line.width <= max_width
+    return [''.join(element.text for element in line.elements)
+                for line
+                in lines]
+
+
+def test_reference_spacing():
+    cases = [
+        ([_text('See '), _ref('R1'), _text(' for details.')],
+         'See R1 for details.'),
+        ([_text('See  '), _ref('R1'), _text('   for details.')],
+         'See R1 for details.'),
+        ([_text('See'), _ref('R1'), _text('for details.')],
+         'See R1 for details.'),
+        ([_text('See '), _ref('R1'), _ref('R2'), _text(' and')],
+         'See R1 R2 and'),
+        ([_ref('R1'), _text(' first')], 'R1 first'),
+        ([_text('last '), _ref('R1')], 'last R1')
+    ]
+    for elements, expected in cases:
+        assert _wrap(elements) == [expected]
+    print('Passed reference spacing tests', file=sys.stderr)
+
+    # lines break at the spaces around reference tags
+    lines = _wrap([_text('word ' * 12), _ref('R1'), _text(' after')], 80)
+    assert all('  ' not in line for line in lines)
+    assert ' '.join(lines).split() == ['word'] * 12 + ['R1', 'after']
+    print('Passed reference wrapping tests', file=sys.stderr)
+
+
+def test_long_words():
+    word = 'x' * 200
+    max_width = 100
+    lines = _wrap([_text(f'short {word} end')], max_width)
+    assert len(lines) > 2
+    assert lines[0].startswith('short x')
+    assert lines[-1].endswith(' end')
+    assert ''.join(lines).replace(' ', '') == f'short{word}end'
+
+    # full lines of the long word
+    word_width = parser.string_width('x', *FONT)
+    for line in lines[1:-1]:
+        assert line == 'x' * len(line)
+        assert (len(line) + 1) * word_width > max_width
+
+    lines = _wrap([_text(word)], max_width)
+    assert ''.join(lines) == word
+    assert all(line != '' for line in lines)
+    print('Passed long word wrapping tests', file=sys.stderr)
+
+
+def main():
+    test_reference_spacing()
+    test_long_words()
+
+
+if __name__ == '__main__':
+    main()